@@ -254,7 +254,10 @@ def dependency(name, query, files):
       "latest(parameter:x == 'value')" or "20230807-152344-ee606dce"
 
     files: str | [str] | dict[str, str]
-      Files to use from the dependent packet
+      Files to use from the dependent packet. A path ending in "/" refers
+      to a directory, and copies all the files within it. When using a
+      dictionary, directories must be copied to a path that also ends in
+      "/", e.g. `{"inputs/": "outputs/"}`.
 
     Returns
     -------
@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+
+import outpack_query_parser as parser
+
+from pyorderly.outpack.root import OutpackRoot, root_open
+from pyorderly.outpack.search import as_query
+from pyorderly.read import orderly_read_static
+
+
+@dataclass
+class ReportGraph:
+    """
+    The dependencies between the reports of an orderly root.
+
+    The graph is built by reading each report's source, without running it,
+    so only dependencies declared with literal arguments are known. See
+    `orderly_read_static` for details.
+
+    Attributes
+    ----------
+    reports : dict
+        The static declarations of each report, keyed by report name.
+    upstream : dict
+        For each report, the names of the reports it depends on. A report
+        depends on another if one of its dependency queries can only match
+        packets with that name. These may include names of reports that do
+        not exist in the root's source directory, for example if their
+        packets are only available from a location.
+    """
+
+    reports: dict[str, dict]
+    upstream: dict[str, set[str]]
+
+    def downstream(self, name: str) -> set[str]:
+        """Get the names of the reports that directly depend on a report."""
+        return {k for k, v in self.upstream.items() if name in v}
+
+    def batches(self, names: list[str] | None = None) -> list[list[str]]:
+        """
+        Group reports into batches that can be run in parallel.
+
+        Each report only depends on reports in earlier batches, so the
+        reports within a batch can be run concurrently once all the previous
+        batches have completed. Dependencies on reports that are not part of
+        the graph are ignored.
+
+        Parameters
+        ----------
+        names :
+            The reports to schedule. Reports they depend upon, directly or
+            indirectly, are included as well. If None, all reports in the
+            graph are scheduled.
+        """
+        if names is None:
+            todo = set(self.reports)
+        else:
+            todo = set()
+            stack = list(names)
+            while stack:
+                name = stack.pop()
+                if name not in self.reports:
+                    msg = f"Unknown report '{name}'"
+                    raise Exception(msg)
+                if name not in todo:
+                    todo.add(name)
+                    stack.extend(self.upstream[name] & self.reports.keys())
+
+        result = []
+        done: set[str] = set()
+        while todo:
+            ready = sorted(
+                name
+                for name in todo
+                if (self.upstream[name] & self.reports.keys()) <= done
+            )
+            if not ready:
+                cycle = ", ".join(f"'{x}'" for x in sorted(todo))
+                msg = f"Dependencies between reports form a cycle: {cycle}"
+                raise Exception(msg)
+            result.append(ready)
+            done.update(ready)
+            todo.difference_update(ready)
+        return result
+
+
+def orderly_report_graph(
+    root: OutpackRoot | str | None = None, *, locate: bool = True
+) -> ReportGraph:
+    """
+    Build the graph of dependencies between an orderly root's reports.
+
+    Parameters
+    ----------
+    root :
+        The path to the root, or an already open root.
+    locate :
+        Whether to search parent directories of `root` for the root.
+    """
+    root = root_open(root, locate=locate)
+    path_src = root.path / "src"
+
+    reports = {}
+    upstream = {}
+    if path_src.is_dir():
+        for p in sorted(path_src.iterdir()):
+            entrypoint = p / f"{p.name}.py"
+            if entrypoint.is_file():
+                dat = orderly_read_static(entrypoint)
+                reports[p.name] = dat
+                upstream[p.name] = _dependency_names(dat["dependencies"])
+
+    return ReportGraph(reports, upstream)
+
+
+def _dependency_names(dependencies) -> set[str]:
+    result = set()
+    for d in dependencies:
+        if d["name"] is not None:
+            result.add(d["name"])
+        else:
+            result.update(_query_names(as_query(d["query"]).node))
+    return result
+
+
+def _query_names(node) -> set[str]:
+    """Find the packet names which a query requires.
+
+    This looks for `name == "..."` tests in the query. Tests appearing in a
+    negation are skipped, as they exclude packets rather than select them.
+    """
+    if isinstance(node, (parser.Latest, parser.Single)):
+        return set() if node.inner is None else _query_names(node.inner)
+    elif isinstance(node, parser.Brackets):
+        return _query_names(node.inner)
+    elif isinstance(node, parser.BooleanExpr):
+        return _query_names(node.lhs) | _query_names(node.rhs)
+    elif (
+        isinstance(node, parser.Test)
+        and node.operator == parser.TestOperator.Equal
+    ):
+        for lhs, rhs in [(node.lhs, node.rhs), (node.rhs, node.lhs)]:
+            if isinstance(lhs, parser.LookupName) and isinstance(
+                rhs, parser.Literal
+            ):
+                return {rhs.value}
+    return set()
@@ -0,0 +1,96 @@
+import gzip
+import shutil
+from pathlib import Path
+
+# Compressed files in the file store are marked by their extension, so they
+# can't be mistaken for uncompressed files that happen to look like a
+# compressed stream (such as a packet's own .gz outputs).
+COMPRESSION_SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+
+
+def compression_default() -> str:
+    """Get the best supported compression method: zstd if available."""
+    return "zstd" if _zstd_available() else "gzip"
+
+
+def compression_validate(method: str | None) -> str | None:
+    if method == "auto":
+        return compression_default()
+    if method is not None and method not in COMPRESSION_SUFFIXES:
+        valid = ", ".join(f"'{x}'" for x in COMPRESSION_SUFFIXES)
+        msg = f"Invalid compression method '{method}', must be one of {valid}"
+        raise Exception(msg)
+    return method
+
+
+def compression_from_suffix(path) -> str | None:
+    suffix = Path(path).suffix
+    for method, s in COMPRESSION_SUFFIXES.items():
+        if suffix == s:
+            return method
+    return None
+
+
+def compress_file(src, dst, method: str) -> None:
+    with open(src, "rb") as f_in, open(dst, "wb") as f_out:
+        if method == "gzip":
+            with gzip.GzipFile(fileobj=f_out, mode="wb", mtime=0) as z:
+                shutil.copyfileobj(f_in, z)
+        else:
+            with _zstd_writer(f_out) as z:
+                shutil.copyfileobj(f_in, z)
+
+
+def decompress_stream(src, dst, method: str) -> None:
+    """Decompress the contents of one file object into another."""
+    if method == "gzip":
+        with gzip.GzipFile(fileobj=src, mode="rb") as z:
+            shutil.copyfileobj(z, dst)
+    else:
+        with _zstd_reader(src) as z:
+            shutil.copyfileobj(z, dst)
+
+
+def decompress_file(src, dst, method: str) -> None:
+    with open(src, "rb") as f_in, open(dst, "wb") as f_out:
+        decompress_stream(f_in, f_out, method)
+
+
+def _zstd_available() -> bool:
+    try:
+        _zstd_module()
+    except Exception:
+        return False
+    return True
+
+
+def _zstd_module():
+    # zstd is part of the standard library from Python 3.14, and available
+    # from the 'zstandard' package before that.
+    try:
+        from compression import zstd  # type: ignore  # noqa: PLC0415
+    except ImportError:
+        pass
+    else:
+        return zstd
+
+    try:
+        import zstandard  # type: ignore  # noqa: PLC0415
+    except ImportError:
+        msg = "zstd compression requires the 'zstandard' package"
+        raise Exception(msg) from None
+    return zstandard
+
+
+def _zstd_writer(f):
+    zstd = _zstd_module()
+    if zstd.__name__ == "compression.zstd":
+        return zstd.ZstdFile(f, mode="w")
+    return zstd.ZstdCompressor().stream_writer(f, closefd=False)
+
+
+def _zstd_reader(f):
+    zstd = _zstd_module()
+    if zstd.__name__ == "compression.zstd":
+        return zstd.ZstdFile(f, mode="r")
+    return zstd.ZstdDecompressor().stream_reader(f, closefd=False)
@@ -1,11 +1,14 @@
 import os.path
+from contextlib import contextmanager
 from dataclasses import dataclass, field
 
 from dataclasses_json import config, dataclass_json
 
+from pyorderly.outpack.compression import compression_validate
+from pyorderly.outpack.lock import root_lock
 from pyorderly.outpack.schema import outpack_schema_version
 from pyorderly.outpack.static import LOCATION_TYPES
-from pyorderly.outpack.util import match_value
+from pyorderly.outpack.util import match_value, write_atomic
 
 
 def read_config(root_path):
@@ -15,13 +18,26 @@ def read_config(root_path):
 
 
 def write_config(config, root_path):
-    with open(_config_path(root_path), "w") as f:
-        f.write(config.to_json())
+    write_atomic(_config_path(root_path), config.to_json())
 
 
-def update_config(config, root_path):
-    # TODO: Implement real update instead of overwriting see mrc-4600
-    write_config(config, root_path)
+@contextmanager
+def update_config(root_path):
+    """
+    Modify a root's configuration.
+
+    The configuration is read afresh on entry, and written back once the
+    block exits successfully. A lock is held throughout, so that changes
+    made by other processes at the same time are not lost.
+
+    Yields
+    ------
+    The current configuration, to be modified in place.
+    """
+    with root_lock(root_path, "config"):
+        config = read_config(root_path)
+        yield config
+        write_config(config, root_path)
 
 
 def _encode_location_dict(d):
@@ -84,6 +100,13 @@ class Config:
             encoder=_encode_location_dict, decoder=_decode_location_dict
         )
     )
+    # This is specific to pyorderly, and so is kept out of the core
+    # configuration shared by all outpack implementations. It is omitted
+    # entirely when compression is not used, keeping the configuration
+    # readable by them.
+    file_store_compression: str | None = field(
+        default=None, metadata=config(exclude=lambda x: x is None)
+    )
 
     @staticmethod
     def new(
@@ -91,16 +114,25 @@ class Config:
         path_archive="archive",
         use_file_store=False,
         require_complete_tree=False,
+        file_store_compression=None,
     ):
         if path_archive is None and not use_file_store:
             msg = "If 'path_archive' is None, 'use_file_store' must be True"
             raise Exception(msg)
+        if file_store_compression is not None and not use_file_store:
+            msg = "'file_store_compression' requires 'use_file_store'"
+            raise Exception(msg)
         version = outpack_schema_version()
         core = ConfigCore(
             "sha256", path_archive, use_file_store, require_complete_tree
         )
         local = Location("local", "local")
-        return Config(version, core, {"local": local})
+        return Config(
+            version,
+            core,
+            {"local": local},
+            compression_validate(file_store_compression),
+        )
 
 
 def _config_path(root_path):
@@ -1,3 +1,4 @@
+import bisect
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -24,18 +25,17 @@ def copy_files(
     options: SearchOptions,
     root: OutpackRoot,
 ) -> Plan:
+    options = SearchOptions.create(options)
     plan = _plan_copy_files(root, id, files)
 
-    try:
-        for here, there in plan.files.items():
-            root.export_file(id, there.path, here, dest)
-
-    except FileNotFoundError as e:
+    missing = root.export_files(plan.files, dest)
+    if missing:
         if not options.allow_remote:
-            msg = f"File `{e.filename}` from packet {id} is not available locally."
-            raise Exception(msg) from e
+            there = next(iter(missing.values())).path
+            msg = f"File `{there}` from packet {id} is not available locally."
+            raise Exception(msg)
         else:
-            copy_files_from_remote(id, plan.files, dest, options, root)
+            copy_files_from_remote(id, missing, dest, options, root)
 
     return plan
 
@@ -71,14 +71,31 @@ def _validate_files(files):
 def _plan_copy_files(root, id, files):
     meta = root.index.metadata(id)
     files = _validate_files(files)
-    known = {f.path: f for f in meta.files}
+    known = meta.path_index
+    paths = None
 
     plan = {}
     for here, there in files.items():
         # TODO: check absolute paths
         if here.endswith("/") or there.endswith("/"):
-            msg = "Directories not yet supported for export"
-            raise Exception(msg)
+            if not (here.endswith("/") and there.endswith("/")):
+                msg = (
+                    "Directories can only be exported to directories: "
+                    f"cannot copy '{there}' to '{here}'"
+                )
+                raise Exception(msg)
+            if paths is None:
+                paths = sorted(known)
+            found = _paths_in_directory(paths, there)
+            if not found:
+                msg = (
+                    f"Packet '{id}' does not contain the requested "
+                    f"directory '{there}'"
+                )
+                raise Exception(msg)
+            for p in found:
+                plan[here + p.removeprefix(there)] = known[p]
+            continue
 
         f = known.get(there, None)
         if f is None:
@@ -86,3 +103,12 @@ def _plan_copy_files(root, id, files):
             raise Exception(msg)
         plan[here] = f
     return Plan(id, meta.name, plan)
+
+
+def _paths_in_directory(paths, directory):
+    """Find the paths, from a sorted list, that are within a directory."""
+    start = bisect.bisect_left(paths, directory)
+    end = start
+    while end < len(paths) and paths[end].startswith(directory):
+        end += 1
+    return paths[start:end]
@@ -1,62 +1,458 @@
+import io
 import os
 import os.path
 import shutil
 import stat
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Iterator
 from contextlib import contextmanager
+from dataclasses import dataclass
 from errno import ENOENT
 from pathlib import Path
 
+from pyorderly.outpack.compression import (
+    COMPRESSION_SUFFIXES,
+    compress_file,
+    compression_from_suffix,
+    compression_validate,
+    decompress_file,
+    decompress_stream,
+)
+from pyorderly.outpack.filestore_bloom import BloomFilter
+from pyorderly.outpack.filestore_pack import Pack, PackEntry, write_pack
 from pyorderly.outpack.hash import Hash, hash_parse, hash_validate_file
-from pyorderly.outpack.util import openable_temporary_file
+from pyorderly.outpack.lock import file_lock
+from pyorderly.outpack.util import (
+    copy_file,
+    openable_temporary_file,
+    parallel_map,
+    replace_later,
+)
+
+
+@dataclass
+class StoreSummary:
+    """
+    Statistics about the contents of a file store.
+
+    Attributes
+    ----------
+    count :
+        The number of files in the store.
+    size :
+        The total size of the files, in bytes.
+    prefixes :
+        The number of files for each two-character prefix of the hashes.
+        The store uses these prefixes as directories, and they should be
+        roughly evenly populated.
+    """
+
+    count: int
+    size: int
+    prefixes: dict[str, int]
+
+
+@dataclass
+class PackedFile:
+    """The location of a file within a pack."""
+
+    pack: Pack
+    entry: PackEntry
+    pack_stat: os.stat_result
+
+    def stat(self) -> os.stat_result:
+        # Files in a pack share the pack's metadata, except for their size.
+        info = list(self.pack_stat)
+        info[stat.ST_SIZE] = self.entry.length
+        return os.stat_result(info)
 
 
 class FileStore:
-    def __init__(self, path):
+    def __init__(self, path, *, compression=None):
         self._path = Path(path)
+        self._compression = compression_validate(compression)
+        self._packs_loaded = None
+        self._packs_lock = threading.Lock()
+        self._contents = None
+        self._bloom = None
         os.makedirs(path, exist_ok=True)
+        if os.path.exists(self.bloom_path):
+            self._bloom = BloomFilter(self.bloom_path)
+        # Looking for compressed copies of a file costs a stat per suffix,
+        # so is only done if the store may hold any.
+        self._compressed = self._compression is not None or os.path.exists(
+            self.compressed_path
+        )
+
+    def __getstate__(self):
+        # Loaded packs and their lock can't be pickled, for example when
+        # the root is passed to a sandboxed report; they are reloaded on
+        # demand instead.
+        state = self.__dict__.copy()
+        state["_packs_loaded"] = None
+        state["_contents"] = None
+        state["_bloom"] = None
+        del state["_packs_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._packs_lock = threading.Lock()
+        if os.path.exists(self.bloom_path):
+            self._bloom = BloomFilter(self.bloom_path)
 
     def filename(self, hash):
         dat = hash_parse(hash)
         return self._path / dat.algorithm / dat.value[:2] / dat.value[2:]
 
+    def find(self, hash) -> Path | None:
+        """
+        Find the file storing a hash's contents.
+
+        This is the same as `filename`, unless the file was compressed when
+        it was stored. Returns None if the hash is not in the store as a
+        file of its own, including if it has been moved into a pack.
+        """
+        path = self.filename(hash)
+        if os.path.exists(path):
+            return path
+        if not self._compressed:
+            return None
+        for suffix in COMPRESSION_SUFFIXES.values():
+            p = path.with_name(path.name + suffix)
+            if os.path.exists(p):
+                return p
+        return None
+
     def get(self, hash, dst, *, overwrite=False):
-        src = self.filename(hash)
-        if not os.path.exists(src):
+        packed = self._find_packed(hash)
+        src = self.find(hash) if packed is None else packed[0].path
+        if src is None:
+            # Another process may have packed the file since we loaded the
+            # packs, too soon after a previous change for the pack
+            # directory's modification time to tell us, or stored it
+            # compressed since we opened the store.
+            packed = self._find_packed(hash, reload=True)
+            if packed is not None:
+                src = packed[0].path
+            elif self._check_compressed():
+                src = self.find(hash)
+        if src is None:
             msg = f"Hash '{hash}' not found in store"
             raise FileNotFoundError(ENOENT, msg)
         os.makedirs(os.path.dirname(dst), exist_ok=True)
         if not overwrite and os.path.exists(dst):
             msg = f"Failed to copy '{src}' to '{dst}', file already exists"
             raise Exception(msg)
-        shutil.copyfile(src, dst)
+        if packed is not None:
+            pack, entry = packed
+            with open(dst, "wb") as f:
+                data = pack.read(entry)
+                if entry.compression is None:
+                    f.write(data)
+                else:
+                    decompress_stream(io.BytesIO(data), f, entry.compression)
+            return
+        method = compression_from_suffix(src)
+        if method is None:
+            copy_file(src, dst)
+        else:
+            decompress_file(src, dst, method)
+        # Record the use of the file, so that `outpack_cache_evict` can
+        # tell which files were used least recently. Filesystems are often
+        # mounted with options that make them update access times lazily,
+        # if at all.
+        try:
+            os.utime(src, ns=(time.time_ns(), os.stat(src).st_mtime_ns))
+        except OSError:
+            pass
 
     def exists(self, hash):
-        return os.path.exists(self.filename(hash))
+        return (
+            self._find_packed(hash) is not None or self.find(hash) is not None
+        )
+
+    def exists_many(self, hashes, *, approximate=False) -> list[bool]:
+        """
+        Check whether several hashes are in the store.
+
+        If the store's contents have been loaded with `load_contents`, this
+        is answered from memory.
+
+        Parameters
+        ----------
+        hashes :
+            The hashes to look for.
+        approximate :
+            If True, and the store has a Bloom filter (see
+            `build_bloom_filter`), only hashes the filter can't rule out
+            are looked up on disk. The filter can miss files added without
+            it, so some files may be wrongly reported missing. This should
+            only be used where that is harmless, such as when deciding
+            which files to fetch from elsewhere.
+        """
+        if self._contents is not None:
+            return [str(h) in self._contents for h in hashes]
+        elif approximate and self._bloom is not None:
+            bloom = self._bloom
+            return [str(h) in bloom and self.exists(h) for h in hashes]
+        else:
+            return [self.exists(h) for h in hashes]
+
+    def load_contents(self):
+        """
+        Load the list of hashes in the store into memory.
+
+        This reads the whole store once, after which `exists_many` doesn't
+        need to access the filesystem. Files added through this object are
+        tracked, but files added or removed by other processes afterwards
+        are not, so this is best suited to short-lived bulk operations.
+        """
+        self._contents = {str(hash) for hash, _ in self.scan()}
+
+    def build_bloom_filter(self, *, error_rate=0.01):
+        """
+        Create a Bloom filter of the store's contents.
 
-    def put(self, src, hash, *, move=False):
-        hash_validate_file(src, hash)
-        dst = self.filename(hash)
-        if not os.path.exists(dst):
+        The filter is saved alongside the store, and used by every process
+        that opens it to speed up `exists_many(approximate=True)`. Files
+        added by `put` are recorded in the filter as they are stored, but
+        only by stores opened after it was built. It is sized to allow the
+        store to double in size; rebuild it if the store grows beyond that.
+        """
+        hashes = [str(hash) for hash, _ in self.scan()]
+        if self._bloom is not None:
+            self._bloom.close()
+        bloom = BloomFilter.create(
+            self.bloom_path, 2 * len(hashes), error_rate=error_rate
+        )
+        for h in hashes:
+            bloom.add(h)
+        self._bloom = bloom
+
+    def put(self, src, hash, *, move=False, verify=True, link=False):
+        # If 'link' is True, the stored file is a hard link to 'src' where
+        # possible, rather than a copy. The two then share their contents
+        # and permissions, so 'src' becomes read-only and must never be
+        # modified afterwards.
+        #
+        # Callers that have only just hashed 'src' themselves (such as
+        # 'insert_packet', using the hashes computed by 'Packet.end')
+        # can skip verification here and avoid reading the file twice.
+        if verify:
+            hash_validate_file(src, hash)
+        # The file is recorded in the Bloom filter before it is stored:
+        # claiming a file exists a moment early is harmless, but another
+        # process finding the file on disk but not in the filter would
+        # wrongly conclude that it was missing.
+        if self._bloom is not None:
+            self._bloom.add(str(hash))
+        if self._find_packed(hash) is None:
+            self._put_file(src, hash, move=move, link=link)
+        else:
+            # Packs are shared by many files, so their timestamps can't
+            # protect this one from garbage collection until the packet
+            # that uses it is written.
+            self._mark_used(hash)
+        if self._contents is not None:
+            self._contents.add(str(hash))
+        return hash
+
+    def _put_file(self, src, hash, *, move, link=False):
+        existing = self.find(hash)
+        if existing is None:
+            dst = self.filename(hash)
             os.makedirs(os.path.dirname(dst), exist_ok=True)
-            if move:
-                shutil.move(src, dst)
+            method = self._compression
+            if method is None or not self._put_compressed(src, dst, method):
+                self._put_uncompressed(src, dst, move=move, link=link)
+            elif move:
+                os.unlink(src)
+        else:
+            # The file may not be referenced by any packet yet. Refreshing
+            # its timestamps stops garbage collection from removing it
+            # before the packet that uses it is written. That needs us to
+            # own the file, which in a store shared between users we may
+            # not, in which case we record its use separately.
+            try:
+                os.utime(existing)
+            except OSError:
+                self._mark_used(hash)
+
+    def _put_uncompressed(self, src, dst, *, move, link):
+        # The file is prepared under a temporary name and renamed into
+        # place, so readers never see a partially written file.
+        with self.tmp() as tmp:
+            if link and _link(src, tmp):
+                pass
+            elif move:
+                try:
+                    os.replace(src, tmp)
+                except OSError:
+                    # Most likely 'src' is on a different filesystem.
+                    shutil.copyfile(src, tmp)
+                    os.unlink(src)
             else:
-                shutil.copyfile(src, dst)
+                shutil.copyfile(src, tmp)
             # Make file readonly for everyone
-            dst.chmod(0o444)
-        return hash
+            os.chmod(tmp, 0o444)
+            # The file may have been moved here, in which case this is its
+            # only copy, so it must not be lost if the caller fails.
+            replace_later(tmp, dst, keep=True)
+
+    def _put_compressed(self, src, dst, method):
+        """
+        Store a compressed copy of a file.
+
+        Returns False, without storing anything, if compression doesn't
+        make the file any smaller. The hash always refers to the
+        uncompressed contents.
+        """
+        suffix = COMPRESSION_SUFFIXES[method]
+        with self.tmp() as tmp:
+            compress_file(src, tmp, method)
+            if os.path.getsize(tmp) >= os.path.getsize(src):
+                return False
+            os.chmod(tmp, 0o444)
+            # Recorded before the file is stored, so that stores opened
+            # without compression configured still look for it.
+            if not os.path.exists(self.compressed_path):
+                self.compressed_path.touch()
+            replace_later(tmp, dst.with_name(dst.name + suffix), keep=True)
+        return True
+
+    def put_many(self, files, *, move=False, verify=True, workers=None):
+        """
+        Add several files to the store concurrently.
+
+        Parameters
+        ----------
+        files :
+            A list of `(src, hash)` pairs.
+        move, verify :
+            As for `put`.
+        workers : int, optional
+            The maximum number of threads used to hash and copy files.
+
+        Returns
+        -------
+        The list of hashes, in the same order as `files`.
+        """
+        # Storing two files with the same hash at the same time would race
+        # on the destination path, so only the first of each is stored.
+        unique = {}
+        for src, hash in files:
+            unique.setdefault(str(hash), src)
+
+        parallel_map(
+            lambda x: self.put(x[1], x[0], move=move, verify=verify),
+            unique.items(),
+            workers=workers,
+        )
+        return [hash for _, hash in files]
+
+    def remove(self, hash):
+        self.remove_many([hash])
+
+    def remove_many(self, hashes):
+        """
+        Remove several files from the store.
+
+        Removing files that are in a pack requires rewriting the pack, so
+        this is much cheaper than removing them one at a time.
+        """
+        packed = set()
+        for hash in hashes:
+            if self._contents is not None:
+                self._contents.discard(str(hash))
+            path = self.find(hash)
+            if path is None and self._check_compressed():
+                path = self.find(hash)
+            if path is not None:
+                _unlink_readonly(path)
+            elif self._find_packed(hash) is not None:
+                packed.add(str(hash))
+            else:
+                msg = f"Hash '{hash}' not found in store"
+                raise FileNotFoundError(ENOENT, msg)
+        if packed:
+            with self._lock():
+                self._write_packs([], exclude=packed)
+
+    def repack(self, *, max_size=65536):
+        """
+        Move small files from the store into pack files.
+
+        All the files no bigger than `max_size` are combined with the
+        contents of any existing packs, into one pack per hash algorithm.
+
+        Returns
+        -------
+        The number of files that were moved into a pack.
+        """
+        with self._lock():
+            loose = [
+                (hash, entry)
+                for hash, entry in self._scan_loose(set())
+                if entry.stat().st_size <= max_size
+            ]
+            self._write_packs(loose, exclude=set())
+            for _, entry in loose:
+                _unlink_readonly(Path(entry.path))
+        return len(loose)
 
     def ls(self):
-        # Lots of ways of pulling this off with higer order functions
-        # (os.walk, Path.glob etc), but this is probably clearest.
-        ret = []
-        for algorithm in os.listdir(self._path):
-            path_alg = self._path / algorithm
-            for prefix in os.listdir(path_alg):
-                path_prefix = os.path.join(path_alg, prefix)
-                for suffix in os.listdir(path_prefix):
-                    ret.append(Hash(algorithm, prefix + suffix))
-        return ret
+        return [hash for hash, _ in self.scan()]
+
+    def scan(self) -> Iterator[tuple[Hash, os.DirEntry | PackedFile]]:
+        """
+        Iterate over the files in the store.
+
+        Unlike `ls`, files are produced as the store is read, rather than
+        all at once.
+
+        Yields
+        ------
+        A pair of the file's hash and either its `os.DirEntry`, or a
+        `PackedFile` if it is stored in a pack. Either way, the entry's
+        `stat()` method gives the file's size and timestamps.
+        """
+        seen = set()
+        for pack in self._packs():
+            info = os.stat(pack.path)
+            for hash, entry in pack.entries():
+                seen.add(str(hash))
+                yield hash, PackedFile(pack, entry, info)
+        yield from self._scan_loose(seen)
+
+    def _scan_loose(self, skip):
+        with os.scandir(self._path) as algorithms:
+            for algorithm in algorithms:
+                if algorithm.name in ("tmp", "pack", "used"):
+                    continue
+                elif not algorithm.is_dir():
+                    continue
+                with os.scandir(algorithm.path) as prefixes:
+                    for prefix in prefixes:
+                        with os.scandir(prefix.path) as entries:
+                            for entry in entries:
+                                name = _strip_compression_suffix(entry.name)
+                                hash = Hash(algorithm.name, prefix.name + name)
+                                if str(hash) not in skip:
+                                    yield hash, entry
+
+    def summary(self) -> "StoreSummary":
+        """Count the files in the store, and their total size."""
+        result = StoreSummary(0, 0, {})
+        for hash, entry in self.scan():
+            prefix = hash.value[:2]
+            result.count += 1
+            result.size += entry.stat().st_size
+            result.prefixes[prefix] = result.prefixes.get(prefix, 0) + 1
+        return result
 
     def destroy(self) -> None:
         def onerror(func, path, _exc_info):
@@ -85,11 +481,36 @@ class FileStore:
                 # the argument-less `raise` statement.
                 raise  # noqa: PLE0704
 
+        self._close_packs()
+        if self._bloom is not None:
+            self._bloom.close()
+            self._bloom = None
+        self._contents = None
         shutil.rmtree(self._path, onerror=onerror)
 
+    @contextmanager
+    def uncompressed(self, hash):
+        """
+        Get the path to a file's uncompressed contents.
+
+        If the file was compressed when it was stored, it is decompressed
+        into a temporary file, which is removed when the context exits.
+        """
+        src = self.find(hash)
+        if src is not None and compression_from_suffix(src) is None:
+            yield src
+        else:
+            with self.tmp() as path:
+                self.get(hash, path, overwrite=True)
+                yield Path(path)
+
+    @property
+    def tmp_path(self):
+        return self._path / "tmp"
+
     @contextmanager
     def tmp(self):
-        path = self._path / "tmp"
+        path = self.tmp_path
         path.mkdir(exist_ok=True)
 
         with openable_temporary_file(dir=path) as f:
@@ -97,3 +518,203 @@ class FileStore:
             # using the path.
             f.close()
             yield f.name
+
+    @property
+    def compressed_path(self):
+        return self._path / "compressed"
+
+    def _check_compressed(self):
+        """
+        Check whether the store has started to hold compressed files.
+
+        Returns True if it has only just done so, since the store was
+        opened.
+        """
+        if self._compressed:
+            return False
+        self._compressed = os.path.exists(self.compressed_path)
+        return self._compressed
+
+    @property
+    def used_path(self):
+        return self._path / "used"
+
+    def _mark_used(self, hash):
+        # A fresh marker is renamed into place, rather than touching an
+        # existing one, which may belong to another user.
+        hash = hash_parse(hash)
+        path = self.used_path
+        path.mkdir(exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path, prefix=".")
+        os.close(fd)
+        os.replace(tmp, path / f"{hash.algorithm}-{hash.value}")
+
+    def recently_used(self, since) -> set[str]:
+        """
+        Get the files that were added again since a given time.
+
+        Files are normally protected from garbage collection for a while
+        after being added, by their timestamps. Where those can't be
+        updated, such as for files in a pack, adding the file again is
+        recorded separately.
+
+        Parameters
+        ----------
+        since :
+            The time, in seconds since the epoch, from which to report.
+
+        Returns
+        -------
+        The hashes, as strings, of the files that were added.
+        """
+        result: set[str] = set()
+        try:
+            entries = list(os.scandir(self.used_path))
+        except FileNotFoundError:
+            return result
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if mtime > since:
+                result.add(entry.name.replace("-", ":", 1))
+        return result
+
+    @property
+    def bloom_path(self):
+        return self._path / "bloom"
+
+    @property
+    def pack_path(self):
+        return self._path / "pack"
+
+    def _packs(self, *, reload=False) -> list[Pack]:
+        # Packs are only added or removed by renaming files in the pack
+        # directory, so its modification time tells us whether the packs we
+        # have loaded are still current.
+        try:
+            mtime = os.stat(self.pack_path).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        # Replaced packs aren't closed here, as other threads may still be
+        # reading from them; they are closed once no longer referenced.
+        with self._packs_lock:
+            loaded = self._packs_loaded
+            if reload or loaded is None or loaded[0] != mtime:
+                self._packs_loaded = (mtime, self._load_packs())
+            return self._packs_loaded[1]
+
+    def _load_packs(self):
+        while True:
+            packs = []
+            try:
+                for p in sorted(self.pack_path.iterdir()):
+                    if p.suffix == ".idx":
+                        packs.append(Pack(p))
+            except FileNotFoundError:
+                # Replaced by another process as we were loading them.
+                for pack in packs:
+                    pack.close()
+                continue
+            return packs
+
+    def _lock(self):
+        # Packs are rewritten as a whole, so only one process may do so at
+        # a time, or files packed by one could be dropped by the other.
+        return file_lock(self._path / "lock")
+
+    def _find_packed(self, hash, *, reload=False):
+        packs = self._packs(reload=reload)
+        if not packs:
+            return None
+        hash = hash_parse(hash)
+        for pack in packs:
+            entry = pack.lookup(hash)
+            if entry is not None:
+                return pack, entry
+        return None
+
+    def _write_packs(self, loose, *, exclude):
+        """
+        Replace the existing packs with new ones.
+
+        The new packs contain everything in the existing packs, except the
+        hashes in `exclude`, as well as the `loose` files.
+        """
+        # Reloaded, in case another process changed the packs too recently
+        # for us to notice.
+        old = self._packs(reload=True)
+        contents = {}
+        for pack in old:
+            for hash, entry in pack.entries():
+                if str(hash) not in exclude:
+                    contents.setdefault(hash.algorithm, {})[hash.value] = (
+                        entry.compression,
+                        lambda pack=pack, entry=entry: pack.read(entry),
+                    )
+        for hash, entry in loose:
+            contents.setdefault(hash.algorithm, {})[hash.value] = (
+                compression_from_suffix(entry.name),
+                lambda path=entry.path: Path(path).read_bytes(),
+            )
+
+        self.pack_path.mkdir(exist_ok=True)
+        self.tmp_path.mkdir(exist_ok=True)
+        for algorithm, items in contents.items():
+            name = f"pack-{algorithm}-{uuid.uuid4().hex}"
+            write_pack(
+                self.tmp_path / name,
+                algorithm,
+                ((v, c, read()) for v, (c, read) in items.items()),
+            )
+            # The index is moved into place last: the pack is only used
+            # once its index is present.
+            for suffix in (".pack", ".idx"):
+                os.replace(
+                    self.tmp_path / (name + suffix),
+                    self.pack_path / (name + suffix),
+                )
+
+        with self._packs_lock:
+            self._packs_loaded = None
+        for pack in old:
+            pack.index_path.unlink()
+            pack.path.unlink()
+
+    def _close_packs(self):
+        with self._packs_lock:
+            if self._packs_loaded is not None:
+                for pack in self._packs_loaded[1]:
+                    pack.close()
+            self._packs_loaded = None
+
+
+def _unlink_readonly(path):
+    try:
+        path.unlink()
+    except PermissionError:
+        # Files are made read-only by `put`, which prevents removing them on
+        # Windows.
+        path.chmod(stat.S_IWUSR)
+        path.unlink()
+
+
+def _link(src, dst):
+    os.unlink(dst)
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Typically because 'src' is on a different filesystem, or the
+        # filesystem doesn't support hard links.
+        return False
+    return True
+
+
+def _strip_compression_suffix(name):
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if name.endswith(suffix):
+            return name.removesuffix(suffix)
+    return name
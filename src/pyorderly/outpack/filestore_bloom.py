@@ -0,0 +1,93 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+from pathlib import Path
+
+# A Bloom filter is a compact, probabilistic representation of a set: it can
+# say for certain that a value is not in the set, but only that a value is
+# probably in it. In a file store this lets us rule out most missing files
+# without touching the filesystem.
+#
+# The filter is stored as a header followed by its bits, and is used through
+# a writable memory map, so that files added by other processes are recorded
+# in it. Bits are only ever set, never cleared.
+#
+# The filter can still miss files: those added by stores opened before it
+# was built, or by other outpack implementations, and bits lost to two
+# processes updating the same byte at once. So it can only be used where
+# wrongly ruling a file out is harmless, such as deciding which files to
+# fetch from a location, where the cost is fetching a file again.
+BLOOM_MAGIC = b"OPBLOOM1"
+_HEADER = struct.Struct("<8sQB")
+
+
+class BloomFilter:
+    def __init__(self, path: Path):
+        self.path = path
+        try:
+            with open(path, "r+b") as f:
+                self._map = mmap.mmap(f.fileno(), 0)
+            self._writable = True
+        except PermissionError:
+            # We can still rule files out, but files we add won't be
+            # recorded, and other processes may fetch them again.
+            with open(path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._writable = False
+        magic, self._bits, self._k = _HEADER.unpack_from(self._map)
+        if magic != BLOOM_MAGIC:
+            msg = f"'{path}' is not a Bloom filter"
+            raise Exception(msg)
+
+    @staticmethod
+    def create(path: Path, capacity: int, error_rate: float = 0.01):
+        """
+        Create an empty Bloom filter.
+
+        Parameters
+        ----------
+        path :
+            The file in which to store the filter. It is written to a
+            temporary file first and renamed into place.
+        capacity :
+            The number of values the filter should hold. Beyond this, the
+            filter still works but its error rate increases.
+        error_rate :
+            The probability of reporting that a value is present when it is
+            not, once the filter is at capacity.
+        """
+        capacity = max(capacity, 1)
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        bits = max(8, bits + (-bits % 8))
+        k = max(1, round(bits / capacity * math.log(2)))
+
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_HEADER.pack(BLOOM_MAGIC, bits, k))
+            f.truncate(_HEADER.size + bits // 8)
+        os.replace(tmp, path)
+        return BloomFilter(path)
+
+    def close(self):
+        self._map.close()
+
+    def add(self, value: str):
+        if not self._writable:
+            return
+        for i in self._positions(value):
+            self._map[_HEADER.size + i // 8] |= 1 << (i % 8)
+
+    def __contains__(self, value: str) -> bool:
+        return all(
+            self._map[_HEADER.size + i // 8] & (1 << (i % 8))
+            for i in self._positions(value)
+        )
+
+    def _positions(self, value):
+        # Double hashing: k positions derived from two independent hashes.
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        a = int.from_bytes(digest[:8], "little")
+        b = int.from_bytes(digest[8:], "little") | 1
+        return [(a + i * b) % self._bits for i in range(self._k)]
@@ -0,0 +1,325 @@
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import humanize
+
+from pyorderly.outpack.hash import Hash
+from pyorderly.outpack.location_pull import _temporary_filestore_path
+from pyorderly.outpack.lock import root_lock
+from pyorderly.outpack.root import OutpackRoot, root_open
+from pyorderly.outpack.util import pl
+
+
+@dataclass
+class GcResult:
+    """
+    The outcome of a garbage collection.
+
+    Attributes
+    ----------
+    hashes :
+        The files removed from the file store, as they were not used by any
+        packet.
+    temporary_files :
+        Leftover temporary files that were removed.
+    size :
+        The total size of the removed files, in bytes.
+    dry_run :
+        If True, nothing was actually removed, and the result describes what
+        would have been.
+    """
+
+    hashes: list[Hash] = field(default_factory=list)
+    temporary_files: list[Path] = field(default_factory=list)
+    size: int = 0
+    dry_run: bool = False
+
+
+def outpack_gc(
+    root: OutpackRoot | str | None = None,
+    *,
+    grace_period: float = 3600,
+    dry_run: bool = False,
+    locate: bool = True,
+) -> GcResult:
+    """
+    Remove unused files from an outpack root.
+
+    This removes files from the file store which are not used by any of the
+    packets whose metadata is known to the root, as well as temporary files
+    left behind by interrupted operations.
+
+    It is safe to run while other processes are using the root: files that
+    were modified less than `grace_period` seconds ago are kept, as they may
+    belong to a packet that is still being inserted or a pull that is still
+    in progress.
+
+    Parameters
+    ----------
+    root :
+        The path to the root, or an already open root.
+    grace_period :
+        The minimum age, in seconds, of files that may be removed.
+    dry_run :
+        If True, find the files that would be removed, but leave them in
+        place.
+    locate :
+        Whether to search parent directories of `root` for the root.
+
+    Returns
+    -------
+    A description of the files that were removed.
+    """
+    root = root_open(root, locate=locate)
+    with root_lock(root.path, "gc"):
+        return _outpack_gc(root, grace_period, dry_run)
+
+
+def _outpack_gc(root, grace_period, dry_run):
+    cutoff = time.time() - grace_period
+    result = GcResult(dry_run=dry_run)
+
+    if root.files is not None:
+        # Files are added to the store before the metadata of the packet
+        # that uses them is written. Listing the store before reading the
+        # index means any file we see is either already referenced by the
+        # index, or recent enough to be protected by the grace period.
+        stored = list(root.files.scan())
+        used = {
+            f.hash
+            for meta in root.index.all_metadata().values()
+            for f in meta.files
+        }
+        # Read after the index, for the same reason as above.
+        used |= root.files.recently_used(cutoff)
+        for hash, entry in stored:
+            if str(hash) not in used:
+                size = _collect(entry, cutoff)
+                if size is not None:
+                    result.hashes.append(hash)
+                    result.size += size
+        if not dry_run:
+            root.files.remove_many(result.hashes)
+
+        _collect_temporary(root.files.tmp_path, cutoff, result)
+        if not dry_run:
+            _remove_stale_markers(root.files.used_path, cutoff)
+
+    _collect_temporary(_temporary_filestore_path(root), cutoff, result)
+
+    verb = "Would remove" if dry_run else "Removed"
+    n = len(result.hashes) + len(result.temporary_files)
+    print(
+        f"{verb} {n} unused {pl(n, 'file')} "
+        f"({humanize.naturalsize(result.size)})"
+    )
+    return result
+
+
+def _collect(entry, cutoff):
+    """Get the size of a file if it is old enough to be removed."""
+    try:
+        info = entry.stat()
+    except FileNotFoundError:
+        return None
+    if _is_recent(info, cutoff):
+        return None
+    return info.st_size
+
+
+def _is_recent(info, cutoff):
+    # The ctime is updated when a file is created, renamed into place or
+    # has its permissions or timestamps changed. Unlike the mtime, this
+    # reflects when the file was last added to the store.
+    return max(info.st_ctime, info.st_mtime) > cutoff
+
+
+def _collect_temporary(path, cutoff, result):
+    if not path.is_dir():
+        return
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            p = Path(dirpath) / name
+            size = _collect(p, cutoff)
+            if size is not None:
+                if not result.dry_run:
+                    _unlink(p)
+                result.temporary_files.append(p)
+                result.size += size
+
+
+def _remove_stale_markers(path, cutoff):
+    # These only protect files for the grace period, so are of no use once
+    # it has passed. They are empty, and aren't reported.
+    if not path.is_dir():
+        return
+    for p in path.iterdir():
+        if _collect(p, cutoff) is not None:
+            p.unlink(missing_ok=True)
+
+
+def _unlink(path):
+    try:
+        path.unlink(missing_ok=True)
+    except PermissionError:
+        path.chmod(0o600)
+        path.unlink(missing_ok=True)
+
+
+@dataclass
+class EvictionResult:
+    """
+    The outcome of evicting files from the file store.
+
+    Attributes
+    ----------
+    hashes :
+        The files evicted from the file store.
+    packets :
+        The packets which are no longer unpacked locally, as some of their
+        files were evicted. They remain available from other locations.
+    size :
+        The total size of the evicted files, in bytes.
+    dry_run :
+        If True, nothing was actually evicted, and the result describes what
+        would have been.
+    """
+
+    hashes: list[Hash] = field(default_factory=list)
+    packets: list[str] = field(default_factory=list)
+    size: int = 0
+    dry_run: bool = False
+
+
+def outpack_cache_evict(
+    root: OutpackRoot | str | None = None,
+    *,
+    max_size: int,
+    grace_period: float = 3600,
+    dry_run: bool = False,
+    locate: bool = True,
+) -> EvictionResult:
+    """
+    Shrink the file store to a size budget, evicting least recently used files.
+
+    This allows a root's file store to be used as a bounded cache in front
+    of a location, for example on a machine with limited disk space.
+
+    Files used by packets which are unpacked locally, and cannot be pulled
+    again from any other location, are never evicted. Packets that lose
+    files are no longer considered unpacked, but are still known to be
+    available from their other locations, from which they can be pulled
+    when needed.
+
+    As with `outpack_gc`, files that were added to the store less than
+    `grace_period` seconds ago are kept, as they may belong to a packet
+    that is still being inserted or pulled.
+
+    Parameters
+    ----------
+    root :
+        The path to the root, or an already open root.
+    max_size :
+        The size, in bytes, to which the file store should be reduced.
+    grace_period :
+        The minimum age, in seconds, of files that may be evicted.
+    dry_run :
+        If True, find the files that would be evicted, but leave them in
+        place.
+    locate :
+        Whether to search parent directories of `root` for the root.
+
+    Returns
+    -------
+    A description of the files that were evicted.
+    """
+    root = root_open(root, locate=locate)
+    if root.files is None:
+        msg = "Evicting files requires a root with a file store"
+        raise Exception(msg)
+    if root.config.core.require_complete_tree:
+        # Demoting a packet would leave any unpacked packet that depends on
+        # it with an incomplete tree.
+        msg = "Can't evict files from a root with 'require_complete_tree'"
+        raise Exception(msg)
+
+    with root_lock(root.path, "gc"):
+        return _outpack_cache_evict(root, max_size, grace_period, dry_run)
+
+
+def _outpack_cache_evict(root, max_size, grace_period, dry_run):
+    cutoff = time.time() - grace_period
+    result = EvictionResult(dry_run=dry_run)
+
+    stored = {}
+    total = 0
+    # As in `_outpack_gc`, the store is listed before the index is read.
+    for hash, entry in root.files.scan():
+        info = entry.stat()
+        stored[str(hash)] = (hash, info)
+        total += info.st_size
+
+    if total > max_size:
+        remote = set()
+        for name, packets in root.index.all_locations().items():
+            if name != "local":
+                remote.update(packets.keys())
+
+        pinned = set()
+        users = {}
+        for id in root.index.unpacked():
+            for f in root.index.metadata(id).files:
+                if id in remote:
+                    users.setdefault(f.hash, set()).add(id)
+                else:
+                    pinned.add(f.hash)
+        # Files added again recently may be about to be used by a packet.
+        recent = root.files.recently_used(cutoff)
+
+        candidates = sorted(
+            (
+                h
+                for h, (_, info) in stored.items()
+                if h not in pinned
+                and h not in recent
+                and not _is_recent(info, cutoff)
+            ),
+            key=lambda h: stored[h][1].st_atime,
+        )
+        packets = set()
+        for h in candidates:
+            if total <= max_size:
+                break
+            hash, info = stored[h]
+            result.hashes.append(hash)
+            result.size += info.st_size
+            total -= info.st_size
+            packets.update(users.get(h, ()))
+        result.packets = sorted(packets)
+
+    if not dry_run:
+        # Packets are demoted before their files are removed, so that a
+        # packet is never considered unpacked while some of its files are
+        # missing.
+        path_local = root.path / ".outpack" / "location" / "local"
+        for id in result.packets:
+            (path_local / id).unlink(missing_ok=True)
+        if result.packets:
+            root.index.rebuild()
+        root.files.remove_many(result.hashes)
+
+    verb = "Would evict" if dry_run else "Evicted"
+    n = len(result.hashes)
+    print(
+        f"{verb} {n} {pl(n, 'file')} "
+        f"({humanize.naturalsize(result.size)}) from the file store"
+    )
+    if total > max_size:
+        print(
+            "The file store is still larger than requested, as its "
+            "remaining files are needed by local packets or were added "
+            "recently"
+        )
+    return result
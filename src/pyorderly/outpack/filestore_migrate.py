@@ -0,0 +1,175 @@
+from dataclasses import dataclass, field
+
+import humanize
+
+from pyorderly.outpack.config import update_config
+from pyorderly.outpack.filestore import FileStore
+from pyorderly.outpack.hash import hash_file, hash_parse
+from pyorderly.outpack.root import OutpackRoot, root_open
+from pyorderly.outpack.util import fsync_batch, parallel_map, pl
+
+
+@dataclass
+class MigrationResult:
+    """
+    The outcome of moving a root's archive into a file store.
+
+    Attributes
+    ----------
+    files :
+        The number of files added to the file store.
+    size :
+        The total size of the files added to the file store, in bytes.
+    missing :
+        Files missing from the archive, as paths relative to the root.
+    corrupt :
+        Files in the archive whose contents don't match their hash, as
+        paths relative to the root.
+    """
+
+    files: int = 0
+    size: int = 0
+    missing: list[str] = field(default_factory=list)
+    corrupt: list[str] = field(default_factory=list)
+
+
+def outpack_migrate_to_file_store(
+    root: OutpackRoot | str | None = None,
+    *,
+    link: bool = True,
+    workers: int | None = None,
+    locate: bool = True,
+) -> MigrationResult:
+    """
+    Add a file store to a root that only has an archive.
+
+    Every file in the archive is checked against its hash and added to a
+    new file store, after which the root is configured to use it. The
+    archive is left in place.
+
+    If the root already has a file store, the files of any packets in the
+    archive alone are added to it.
+
+    Packets can be inserted into the root while this runs: once the root
+    is configured to use the file store, the packets inserted in the
+    meantime are migrated too. Processes that opened the root beforehand
+    keep inserting packets into the archive alone, but their files are
+    still found there when the packets are used. Running the migration
+    again, once those processes have finished, moves them into the store.
+
+    Parameters
+    ----------
+    root :
+        The path to the root, or an already open root.
+    link :
+        If True, the file store's copy of each file is a hard link to the
+        archive's, where possible, so that the files take no extra space.
+        The linked files in the archive become read-only, and must never
+        be modified.
+    workers :
+        The maximum number of threads used to hash and store files.
+    locate :
+        Whether to search parent directories of `root` for the root.
+
+    Returns
+    -------
+    A description of the files that were migrated.
+    """
+    root = root_open(root, locate=locate)
+    if not root.config.core.path_archive:
+        msg = "This root has no archive to migrate"
+        raise Exception(msg)
+
+    result = MigrationResult()
+    if root.files is None:
+        store = FileStore(
+            root.path / ".outpack" / "files",
+            compression=root.config.file_store_compression,
+        )
+        done = set(root.index.unpacked())
+        _migrate_packets(root, store, done, result, link=link, workers=workers)
+        _check_migration(result)
+
+        with update_config(root.path) as config:
+            config.core.use_file_store = True
+        root.config = config
+        root.files = store
+
+        # Packets inserted up to now may only be in the archive.
+        remaining = set(root.index.unpacked()) - done
+    else:
+        # Already migrated, but packets may since have been inserted into
+        # the archive alone, by processes that opened the root before.
+        remaining = set(root.index.unpacked())
+    _migrate_packets(
+        root, root.files, remaining, result, link=link, workers=workers
+    )
+
+    print(
+        f"Added {result.files} {pl(result.files, 'file')} "
+        f"({humanize.naturalsize(result.size)}) to the file store"
+    )
+    _check_migration(result)
+    return result
+
+
+def _migrate_packets(root, store, ids, result, *, link, workers):
+    path_archive = root.config.core.path_archive
+    wanted = {}
+    for id in sorted(ids):
+        meta = root.index.metadata(id)
+        for f in meta.files:
+            if f.hash not in wanted:
+                name = f"{path_archive}/{meta.name}/{id}/{f.path}"
+                wanted[f.hash] = (name, f.size)
+
+    hashes = list(wanted)
+    todo = [
+        h
+        for h, found in zip(hashes, store.exists_many(hashes), strict=True)
+        if not found
+    ]
+
+    def migrate(hash):
+        name, _ = wanted[hash]
+        path = root.path / name
+        expected = hash_parse(hash)
+        try:
+            found = hash_file(path, expected.algorithm)
+        except FileNotFoundError:
+            return "missing"
+        if found != expected:
+            return "corrupt"
+        store.put(path, expected, verify=False, link=link)
+        return "ok"
+
+    with fsync_batch(workers=workers):
+        status = parallel_map(migrate, todo, workers=workers)
+
+    for hash, s in zip(todo, status, strict=True):
+        name, size = wanted[hash]
+        if s == "ok":
+            result.files += 1
+            result.size += size
+        elif s == "missing":
+            result.missing.append(name)
+        else:
+            result.corrupt.append(name)
+
+
+def _check_migration(result):
+    if result.missing or result.corrupt:
+        problems = [f"  - {x} (missing)" for x in result.missing] + [
+            f"  - {x} (corrupt)" for x in result.corrupt
+        ]
+        msg = "\n".join(
+            [
+                "Some files in the archive could not be migrated:",
+                *problems,
+                (
+                    "Restore them, for example by pulling their packets "
+                    "again, and retry."
+                ),
+            ]
+        )
+        raise Exception(msg)
@@ -0,0 +1,147 @@
+import mmap
+import os
+import struct
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from pyorderly.outpack.hash import Hash
+
+# A pack holds the contents of many small files from a file store, in a
+# single file, alongside an index of where each file's contents can be
+# found. This keeps the number of files in a store manageable.
+#
+# The pack file is a header followed by the concatenated contents. The index
+# is a header, giving the hash algorithm, the size of its digests and the
+# number of entries, followed by one fixed-size record per entry:
+#
+#     digest | offset (u64) | length (u64) | compression (u8)
+#
+# Records are sorted by digest, so that entries can be found with a binary
+# search directly against the memory-mapped index.
+PACK_MAGIC = b"OPKPACK1"
+INDEX_MAGIC = b"OPKIDX01"
+_HEADER = struct.Struct("<8sB16sBQ")
+_RECORD = struct.Struct("<QQB")
+_COMPRESSION = [None, "gzip", "zstd"]
+
+
+@dataclass
+class PackEntry:
+    offset: int
+    length: int
+    compression: str | None
+
+
+class Pack:
+    def __init__(self, path: Path):
+        self.path = path.with_suffix(".pack")
+        self.index_path = path.with_suffix(".idx")
+        with open(self.index_path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # The pack is mapped up front, so that it can still be read after
+        # being replaced by a repack, for as long as this object is open.
+        with open(self.path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, algorithm, self._digest_size, self._count = (
+            _HEADER.unpack_from(self._map)
+        )
+        if magic != INDEX_MAGIC:
+            msg = f"'{self.index_path}' is not a pack index"
+            raise Exception(msg)
+        self.algorithm = algorithm[:n].decode()
+        self._record_size = self._digest_size + _RECORD.size
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._map.close()
+        self._data.close()
+
+    def lookup(self, hash: Hash) -> PackEntry | None:
+        if hash.algorithm != self.algorithm:
+            return None
+        try:
+            digest = bytes.fromhex(hash.value)
+        except ValueError:
+            return None
+
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            found = self._digest(mid)
+            if found == digest:
+                return self._entry(mid)
+            elif found < digest:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def entries(self) -> Iterator[tuple[Hash, PackEntry]]:
+        for i in range(self._count):
+            yield Hash(self.algorithm, self._digest(i).hex()), self._entry(i)
+
+    def read(self, entry: PackEntry) -> bytes:
+        return self._data[entry.offset : entry.offset + entry.length]
+
+    def _digest(self, i):
+        start = _HEADER.size + i * self._record_size
+        return self._map[start : start + self._digest_size]
+
+    def _entry(self, i):
+        start = _HEADER.size + i * self._record_size + self._digest_size
+        offset, length, compression = _RECORD.unpack_from(self._map, start)
+        return PackEntry(offset, length, _COMPRESSION[compression])
+
+
+def write_pack(
+    path: Path,
+    algorithm: str,
+    contents: Iterable[tuple[str, str | None, bytes]],
+) -> None:
+    """
+    Write a pack file and its index.
+
+    Parameters
+    ----------
+    path :
+        The path of the pack, without extension.
+    algorithm :
+        The hash algorithm used by all of the pack's contents.
+    contents :
+        The `(value, compression, data)` triples to write into the pack,
+        where `value` is the hex digest of the uncompressed contents and
+        `data` are the bytes to store.
+    """
+    records = []
+    digest_size = None
+    with open(path.with_suffix(".pack"), "wb") as f:
+        f.write(PACK_MAGIC)
+        for value, compression, data in contents:
+            digest = bytes.fromhex(value)
+            digest_size = len(digest)
+            offset = f.tell()
+            f.write(data)
+            records.append(
+                (digest, offset, len(data), _COMPRESSION.index(compression))
+            )
+        f.flush()
+        os.fsync(f.fileno())
+
+    records.sort()
+    header = _HEADER.pack(
+        INDEX_MAGIC,
+        len(algorithm),
+        algorithm.encode(),
+        digest_size or 0,
+        len(records),
+    )
+    with open(path.with_suffix(".idx"), "wb") as f:
+        f.write(header)
+        for digest, *rest in records:
+            f.write(digest)
+            f.write(_RECORD.pack(*rest))
+        f.flush()
+        os.fsync(f.fileno())
@@ -0,0 +1,194 @@
+import heapq
+from dataclasses import dataclass, field
+
+from pyorderly.outpack.root import OutpackRoot, root_open
+
+
+@dataclass
+class NameUsage:
+    """
+    The storage used by the packets of one name.
+
+    Attributes
+    ----------
+    name :
+        The packet name.
+    packets :
+        The number of unpacked packets with this name.
+    size :
+        The total size of the files in these packets, counting every copy.
+    unique_size :
+        The size of the distinct files used only by packets of this name.
+        This is what removing every packet of this name would free.
+    shared_size :
+        The size of the distinct files that packets of other names use too.
+    """
+
+    name: str
+    packets: int = 0
+    size: int = 0
+    unique_size: int = 0
+    shared_size: int = 0
+
+    @property
+    def duplicate_ratio(self) -> float:
+        """How many times over, on average, each distinct file is used."""
+        distinct = self.unique_size + self.shared_size
+        return self.size / distinct if distinct else 1.0
+
+
+@dataclass
+class BlobUsage:
+    """
+    A single file in the store, and the packets that use it.
+
+    Attributes
+    ----------
+    hash :
+        The hash of the file.
+    size :
+        The size of the file.
+    packets :
+        The number of packets that contain the file.
+    names :
+        The names of those packets.
+    """
+
+    hash: str
+    size: int
+    packets: int
+    names: list[str]
+
+
+@dataclass
+class StorageReport:
+    """
+    A summary of how much space a root's packets use, and share.
+
+    Attributes
+    ----------
+    packets :
+        The number of unpacked packets.
+    files :
+        The number of files in those packets, counting every copy.
+    size :
+        The total size of those files, counting every copy. This is the
+        space they would use without deduplication.
+    unique_size :
+        The total size of the distinct files.
+    stored_size :
+        The space used by the file store on disk, after any compression
+        and packing, or None if the root has no file store.
+    names :
+        The storage used by each packet name.
+    largest :
+        The largest files, from the largest down.
+    """
+
+    packets: int = 0
+    files: int = 0
+    size: int = 0
+    unique_size: int = 0
+    stored_size: int | None = None
+    names: dict[str, NameUsage] = field(default_factory=dict)
+    largest: list[BlobUsage] = field(default_factory=list)
+
+    @property
+    def saved_size(self) -> int:
+        """The space saved by storing each distinct file only once."""
+        return self.size - self.unique_size
+
+    @property
+    def duplicate_ratio(self) -> float:
+        """How many times over, on average, each distinct file is used."""
+        return self.size / self.unique_size if self.unique_size else 1.0
+
+
+def outpack_storage_report(
+    root: OutpackRoot | str | None = None,
+    *,
+    largest: int = 10,
+    locate: bool = True,
+) -> StorageReport:
+    """
+    Report how much space packets use, and how much they share.
+
+    Files are identified by their hash, so a file that several packets
+    contain is only stored once. This measures the space this saves, and
+    which packet names account for the space that is used. Only unpacked
+    packets are included, as other packets' files aren't stored locally.
+
+    The sizes come from the metadata held by the index, so the files
+    themselves are never read.
+
+    Parameters
+    ----------
+    root :
+        The path to the root, or an already open root.
+    largest :
+        The number of largest files to include in the report.
+    locate :
+        Whether to search parent directories of `root` for the root.
+
+    Returns
+    -------
+    The storage report.
+    """
+    root = root_open(root, locate=locate)
+    result = StorageReport()
+
+    # For each distinct file: its size, how many packets use it, and the
+    # name of the packets that use it, or a set of names if there are
+    # several. Most files are used by just one name, and a set for each
+    # would take several times the memory.
+    usage: dict[str, list] = {}
+    for id in root.index.unpacked():
+        meta = root.index.metadata(id)
+        name = result.names.get(meta.name)
+        if name is None:
+            name = result.names[meta.name] = NameUsage(meta.name)
+        name.packets += 1
+        result.packets += 1
+        seen = set()
+        for f in meta.files:
+            name.size += f.size
+            result.files += 1
+            result.size += f.size
+            if f.hash in seen:
+                continue
+            seen.add(f.hash)
+            u = usage.get(f.hash)
+            if u is None:
+                usage[f.hash] = [f.size, 1, meta.name]
+            else:
+                u[1] += 1
+                if u[2] != meta.name:
+                    if isinstance(u[2], str):
+                        u[2] = {u[2]}
+                    u[2].add(meta.name)
+
+    for size, _, names in usage.values():
+        result.unique_size += size
+        if isinstance(names, str):
+            result.names[names].unique_size += size
+        else:
+            for n in names:
+                result.names[n].shared_size += size
+
+    top = heapq.nlargest(largest, usage.items(), key=lambda x: x[1][0])
+    result.largest = [
+        BlobUsage(
+            h,
+            size,
+            packets,
+            [names] if isinstance(names, str) else sorted(names),
+        )
+        for h, (size, packets, names) in top
+    ]
+
+    if root.files is not None:
+        result.stored_size = sum(
+            entry.stat().st_size for _, entry in root.files.scan()
+        )
+
+    return result
@@ -1,6 +1,8 @@
 import hashlib
 from dataclasses import dataclass
 
+from pyorderly.outpack.util import parallel_map
+
 
 @dataclass
 class Hash:
@@ -20,6 +22,18 @@ def hash_file(path, algorithm="sha256"):
     return Hash(algorithm, h.hexdigest())
 
 
+def hash_files(paths, algorithm="sha256", *, workers=None):
+    """
+    Hash several files concurrently.
+
+    The hashes are returned in the same order as `paths`. See
+    `parallel_map` for the meaning of `workers`.
+    """
+    return parallel_map(
+        lambda p: hash_file(p, algorithm), paths, workers=workers
+    )
+
+
 def hash_string(data, algorithm):
     h = hashlib.new(algorithm)
     h.update(data.encode())
@@ -64,7 +64,8 @@ def _index_update(path_root, data):
 def _read_metadata(path_root, data):
     path = path_root / ".outpack" / "metadata"
     for p in path.iterdir():
-        if p.name not in data:
+        # Names starting with '.' are files still being written.
+        if p.name not in data and not p.name.startswith("."):
             data[p.name] = read_metadata_core(p)
     return data
 
@@ -76,6 +77,6 @@ def _read_locations(path_root, data) -> dict[str, dict[str, PacketLocation]]:
             data[loc.name] = {}
         d = data[loc.name]
         for p in loc.iterdir():
-            if p.name not in d:
+            if p.name not in d and not p.name.startswith("."):
                 d[p.name] = read_packet_location(p)
     return data
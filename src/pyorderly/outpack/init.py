@@ -10,6 +10,7 @@ def outpack_init(
     path_archive="archive",
     use_file_store=False,
     require_complete_tree=False,
+    file_store_compression=None,
 ):
     path = Path(path)
     if path.exists() and not path.is_dir():
@@ -24,6 +25,7 @@ def outpack_init(
         path_archive=path_archive,
         use_file_store=use_file_store,
         require_complete_tree=require_complete_tree,
+        file_store_compression=file_store_compression,
     )
 
     path_outpack = path.joinpath(".outpack")
@@ -5,10 +5,6 @@ from typing import TypeAlias
 
 from pyorderly.outpack.config import Location, update_config
 from pyorderly.outpack.location_driver import LocationDriver
-from pyorderly.outpack.location_http import OutpackLocationHTTP
-from pyorderly.outpack.location_packit import outpack_location_packit
-from pyorderly.outpack.location_path import OutpackLocationPath
-from pyorderly.outpack.location_ssh import OutpackLocationSSH, parse_ssh_url
 from pyorderly.outpack.metadata import MetadataCore
 from pyorderly.outpack.root import OutpackRoot, root_open
 from pyorderly.outpack.static import (
@@ -39,14 +35,20 @@ def outpack_location_add(name, type, args, root=None, *, locate=True):
     if type == "path":
         root_open(loc.args["path"], locate=False)
     elif type == "ssh":
+        from pyorderly.outpack.location_ssh import (  # noqa: PLC0415
+            parse_ssh_url,
+        )
+
         parse_ssh_url(loc.args["url"])
     elif type in ("custom",):  # pragma: no cover
         msg = f"Cannot add a location with type '{type}' yet."
         raise Exception(msg)
 
-    config = root.config
-    config.location[name] = loc
-    update_config(config, root.path)
+    with update_config(root.path) as config:
+        # Check again, as another process may have added it meanwhile.
+        root.config = config
+        _location_check_new_name(root, name)
+        config.location[name] = loc
 
 
 def outpack_location_add_path(name, path, root=None, *, locate=True):
@@ -65,19 +67,19 @@ def outpack_location_remove(name, root=None, *, locate=True):
         msg = f"Cannot remove default location '{name}'"
         raise Exception(msg)
 
-    _location_check_exists(root, name)
-    config = root.config
+    with update_config(root.path) as config:
+        root.config = config
+        _location_check_exists(root, name)
 
-    # TODO: mark packets as orphaned mrc-4601
+        # TODO: mark packets as orphaned mrc-4601
 
-    location_path = root.path / ".outpack" / "location" / name
-    if location_path.exists():
-        ## Skipped on covr because this dir won't exist until packet pulling implemented
-        shutil.rmtree(location_path)  # pragma: no cover
+        location_path = root.path / ".outpack" / "location" / name
+        if location_path.exists():
+            ## Skipped on covr because this dir won't exist until packet pulling implemented
+            shutil.rmtree(location_path)  # pragma: no cover
 
-    root.index.rebuild()
-    config.location.pop(name)
-    update_config(config, root.path)
+        root.index.rebuild()
+        config.location.pop(name)
 
 
 def outpack_location_rename(old, new, root=None, *, locate=True):
@@ -87,14 +89,14 @@ def outpack_location_rename(old, new, root=None, *, locate=True):
         msg = f"Cannot rename default location '{old}'"
         raise Exception(msg)
 
-    _location_check_new_name(root, new)
-    _location_check_exists(root, old)
+    with update_config(root.path) as config:
+        root.config = config
+        _location_check_new_name(root, new)
+        _location_check_exists(root, old)
 
-    config = root.config
-    new_loc = config.location.pop(old)
-    new_loc.name = new
-    config.location[new] = new_loc
-    update_config(config, root.path)
+        new_loc = config.location.pop(old)
+        new_loc.name = new
+        config.location[new] = new_loc
 
 
 def location_resolve_valid(
@@ -156,19 +158,39 @@ def _location_exists(root, name):
     return name in outpack_location_list(root)
 
 
+# The drivers are imported as they are needed; between them they depend on
+# paramiko, requests and an OAuth client, which take a substantial
+# fraction of a second to import. Most sessions, and in particular every
+# report run in a sandbox, never touch a remote location.
 def _location_driver(location_name, root) -> LocationDriver:
     location = root.config.location[location_name]
     if location.type == "path":
+        from pyorderly.outpack.location_path import (  # noqa: PLC0415
+            OutpackLocationPath,
+        )
+
         return OutpackLocationPath(location.args["path"])
     elif location.type == "ssh":
+        from pyorderly.outpack.location_ssh import (  # noqa: PLC0415
+            OutpackLocationSSH,
+        )
+
         return OutpackLocationSSH(
             location.args["url"],
             location.args.get("known_hosts"),
             location.args.get("password"),
         )
     elif location.type == "http":
+        from pyorderly.outpack.location_http import (  # noqa: PLC0415
+            OutpackLocationHTTP,
+        )
+
         return OutpackLocationHTTP(location.args["url"])
     elif location.type == "packit":
+        from pyorderly.outpack.location_packit import (  # noqa: PLC0415
+            outpack_location_packit,
+        )
+
         return outpack_location_packit(
             location.args["url"], location.args.get("token")
         )
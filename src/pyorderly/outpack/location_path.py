@@ -1,4 +1,3 @@
-import os
 import shutil
 from pathlib import Path
 
@@ -44,16 +43,16 @@ class OutpackLocationPath(LocationDriver):
     @override
     def fetch_file(self, _packet: MetadataCore, file: PacketFile, dest: str):
         if self.__root.config.core.use_file_store:
-            path = self.__root.files.filename(file.hash)
-            if not os.path.exists(path):
+            if not self.__root.files.exists(file.hash):
                 msg = f"Hash '{file.hash}' not found at location"
                 raise Exception(msg)
+            self.__root.files.get(file.hash, dest, overwrite=True)
         else:
             path = find_file_by_hash(self.__root, file.hash)
             if path is None:
                 msg = f"Hash '{file.hash}' not found at location"
                 raise Exception(msg)
-        shutil.copyfile(path, dest)
+            shutil.copyfile(path, dest)
 
     @override
     def list_unknown_packets(self, ids: list[str]) -> list[str]:
@@ -1,9 +1,9 @@
 import itertools
-import os
 import time
 from collections.abc import Generator
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
+from pathlib import Path
 
 import humanize
 
@@ -22,13 +22,20 @@ from pyorderly.outpack.metadata import (
 )
 from pyorderly.outpack.root import (
     OutpackRoot,
-    find_file_by_hash,
-    mark_known,
+    find_files_by_hash,
+    mark_known_many,
     root_open,
 )
 from pyorderly.outpack.search_options import SearchOptions
 from pyorderly.outpack.static import LOCATION_LOCAL
-from pyorderly.outpack.util import format_list, partition, pl
+from pyorderly.outpack.util import (
+    format_list,
+    fsync_batch,
+    fsync_later,
+    partition,
+    pl,
+    write_atomic,
+)
 
 
 def outpack_location_pull_metadata(
@@ -76,11 +83,8 @@ def _store_packet_metadata(
         ],
     )
 
-    path_metadata = root.path / ".outpack" / "metadata"
-    os.makedirs(path_metadata, exist_ok=True)
-    filename = path_metadata / packet.packet
-    with open(filename, "w") as f:
-        f.writelines(metadata)
+    filename = root.path / ".outpack" / "metadata" / packet.packet
+    write_atomic(filename, metadata)
 
 
 def _get_remove_location_hint(location_name):
@@ -122,16 +126,9 @@ def _validate_hashes(
 def _mark_all_known(
     root: OutpackRoot, location_name: str, packets: list[PacketLocation]
 ):
-    known_already = root.index.packets_in_location(root)
-    for packet in packets:
-        if packet.packet not in known_already:
-            mark_known(
-                root,
-                packet.packet,
-                location_name,
-                packet.hash,
-                packet.time,
-            )
+    known_already = set(root.index.packets_in_location(location_name))
+    new = [p for p in packets if p.packet not in known_already]
+    mark_known_many(root, location_name, new)
 
 
 def outpack_location_pull_packet(
@@ -187,17 +184,25 @@ non-recursive pull, as this might leave an incomplete tree"""
         use_archive = root.config.core.path_archive is not None
         n_packets = len(plan.packets)
         time_start = time.time()
-        for idx, packet in enumerate(plan.packets.values()):
-            if use_archive:
-                print(
-                    f"Writing files for '{packet.packet}' (packet {idx + 1}/"
-                    f"{n_packets})"
-                )
-                _location_pull_files_archive(packet.packet, store, root)
-
-            mark_known(
-                root, packet.packet, LOCATION_LOCAL, packet.hash, time.time()
-            )
+        if use_archive:
+            with fsync_batch():
+                for idx, packet in enumerate(plan.packets.values()):
+                    print(
+                        f"Writing files for '{packet.packet}' (packet "
+                        f"{idx + 1}/{n_packets})"
+                    )
+                    _location_pull_files_archive(packet.packet, store, root)
+
+    # The packets' files are all durable by now, so they can be marked as
+    # known together.
+    mark_known_many(
+        root,
+        LOCATION_LOCAL,
+        [
+            PacketLocation(packet.packet, time.time(), packet.hash)
+            for packet in plan.packets.values()
+        ],
+    )
 
     print(
         f"Unpacked {n_packets} {pl(n_packets, 'packet')} in "
@@ -231,7 +236,17 @@ def location_pull_files(
     store = root.files
     cleanup_store = False
     if store is not None:
-        exists, missing = partition(lambda file: store.exists(file.hash), files)
+        hashes = [file.hash for file in files]
+        present = {
+            h
+            for h, x in zip(
+                hashes,
+                store.exists_many(hashes, approximate=True),
+                strict=True,
+            )
+            if x
+        }
+        exists, missing = partition(lambda file: file.hash in present, files)
 
         if exists:
             print(
@@ -243,12 +258,15 @@ def location_pull_files(
         store = _temporary_filestore(root)
         cleanup_store = True
 
+        # The files found here have just been verified, so we don't need
+        # the store to hash them again.
+        found = find_files_by_hash(root, [file.hash for file in files])
         missing = []
         no_found = 0
         for file in files:
-            path = find_file_by_hash(root, file.hash)
+            path = found.get(file.hash)
             if path is not None:
-                store.put(path, file.hash)
+                store.put(path, file.hash, verify=False)
                 no_found += 1
             else:
                 missing.append(file)
@@ -265,18 +283,22 @@ def location_pull_files(
             f"({total_size}) from {len(locations)} "
             f"{pl(locations, 'location')}"
         )
-        for location in locations:
-            from_this_location = [
-                file for file in missing if file.location == location
-            ]
-            with _location_driver(location, root) as driver:
-                _location_pull_hash_store(
-                    from_this_location,
-                    location,
-                    driver,
-                    store,
-                    root,
-                )
+        # Files fetched into the root's own store are flushed to disk
+        # together, before anything uses them. Those in a temporary store
+        # are thrown away afterwards, so needn't be.
+        with nullcontext() if cleanup_store else fsync_batch():
+            for location in locations:
+                from_this_location = [
+                    file for file in missing if file.location == location
+                ]
+                with _location_driver(location, root) as driver:
+                    _location_pull_hash_store(
+                        from_this_location,
+                        location,
+                        driver,
+                        store,
+                        root,
+                    )
 
     try:
         yield store
@@ -312,6 +334,7 @@ def _location_pull_files_archive(packet_id: str, store, root: OutpackRoot):
     )
     for file in meta.files:
         store.get(file.hash, dest_root / file.path, overwrite=True)
+        fsync_later(dest_root / file.path)
 
 
 def _pull_missing_metadata(
@@ -325,10 +348,13 @@ def _pull_missing_metadata(
     to_pull = [p for p in packets if p.packet not in known_here]
     metadata = driver.metadata([p.packet for p in to_pull])
 
-    for packet in to_pull:
-        _store_packet_metadata(
-            root, location_name, packet, metadata[packet.packet]
-        )
+    # The metadata must be durable before the packets are marked as known,
+    # which happens afterwards in a separate batch.
+    with fsync_batch():
+        for packet in to_pull:
+            _store_packet_metadata(
+                root, location_name, packet, metadata[packet.packet]
+            )
 
 
 @dataclass
@@ -480,6 +506,7 @@ def _location_build_pull_plan_files(
     root: OutpackRoot,
 ) -> list[PacketFileWithLocation]:
     metadata = root.index.all_metadata()
+    wanted = {id: set(hashes) for id, hashes in files.items()}
 
     # Find first location within the set which contains each packet
     # We've already checked earlier that the file is in at least 1
@@ -491,7 +518,7 @@ def _location_build_pull_plan_files(
         packets_in_location = location_packets.intersection(packet_ids)
         for packet_id in packets_in_location:
             for file in metadata[packet_id].files:
-                if packet_id in files and file.hash not in files[packet_id]:
+                if packet_id in wanted and file.hash not in wanted[packet_id]:
                     continue
                 file_with_location = PacketFileWithLocation.from_packet_file(
                     file, location_name, packet_id
@@ -515,5 +542,9 @@ def _location_build_packet_locations(
     return packets_fetch
 
 
+def _temporary_filestore_path(root: OutpackRoot) -> Path:
+    return root.path / "orderly" / "pull"
+
+
 def _temporary_filestore(root: OutpackRoot) -> FileStore:
-    return FileStore(root.path / "orderly" / "pull")
+    return FileStore(_temporary_filestore_path(root))
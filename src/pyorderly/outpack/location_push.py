@@ -37,13 +37,14 @@ def outpack_location_push(
         plan = location_build_push_plan(driver, as_list(ids), root)
         for h in plan.files:
             if root.files is not None:
-                path = root.files.filename(h)
+                with root.files.uncompressed(h) as path:
+                    driver.push_file(path, h)
             else:
                 path = find_file_by_hash(root, h)
                 if path is None:
                     msg = "Did not find suitable file, can't push this packet"
                     raise Exception(msg)
-            driver.push_file(path, h)
+                driver.push_file(path, h)
 
         packets = root.index.location(LOCATION_LOCAL)
         for id in plan.packets:
@@ -7,6 +7,10 @@ from urllib.parse import urlsplit
 import paramiko
 from typing_extensions import override
 
+from pyorderly.outpack.compression import (
+    COMPRESSION_SUFFIXES,
+    decompress_stream,
+)
 from pyorderly.outpack.config import Config
 from pyorderly.outpack.hash import hash_parse
 from pyorderly.outpack.location_driver import LocationDriver
@@ -107,6 +111,9 @@ class OutpackLocationSSH(LocationDriver):
         path = self._root / ".outpack" / "location" / LOCATION_LOCAL
         result = {}
         for packet in self._sftp.listdir(str(path)):
+            if packet.startswith("."):
+                # Still being written by the remote root.
+                continue
             with self._sftp.open(str(path / packet)) as f:
                 result[packet] = PacketLocation.from_json(f.read().strip())
         return result
@@ -130,13 +137,39 @@ class OutpackLocationSSH(LocationDriver):
             raise Exception(msg)
 
         try:
-            self._sftp.get(str(path), dest)
+            path, method, size = self._find_compressed(path)
+            if method is None:
+                self._sftp.get(str(path), dest)
+            else:
+                # Decompress the file as it arrives, so it crosses the
+                # network in its compressed form.
+                with self._sftp.open(str(path), "rb") as src:
+                    src.prefetch(size)
+                    with open(dest, "wb") as f:
+                        decompress_stream(src, f, method)
         except OSError as e:
-            if e.errno == errno.ENOENT:
-                msg = f"Hash '{file.hash}' not found at location"
+            if e.errno != errno.ENOENT:
+                raise
+            elif self._has_packs():
+                msg = (
+                    f"Hash '{file.hash}' not found at location. Its file "
+                    "store has packs, which can't be read over ssh; the "
+                    "file may be in one of them"
+                )
                 raise Exception(msg) from e
             else:
-                raise
+                msg = f"Hash '{file.hash}' not found at location"
+                raise Exception(msg) from e
+
+    def _has_packs(self):
+        if not self.config.core.use_file_store:
+            return False
+        path = self._root / ".outpack" / "files" / "pack"
+        try:
+            self._sftp.stat(str(path))
+        except OSError:
+            return False
+        return True
 
     @override
     def list_unknown_packets(self, ids: list[str]) -> list[str]:
@@ -154,6 +187,27 @@ class OutpackLocationSSH(LocationDriver):
     def push_metadata(self, src: Path, hash: str):
         raise NotImplementedError()
 
+    def _find_compressed(self, path):
+        """
+        Find the compressed copy of a file in the location's store.
+
+        Returns the path of the file to fetch, its compression method, and
+        its size if compressed.
+        """
+        method = self.config.file_store_compression
+        if method is None or not self.config.core.use_file_store:
+            return path, None, None
+        # Files that didn't compress well are stored uncompressed even in
+        # a compressed store, so we fall back to the original path.
+        compressed = path.with_name(path.name + COMPRESSION_SUFFIXES[method])
+        try:
+            info = self._sftp.stat(str(compressed))
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                return path, None, None
+            raise
+        return compressed, method, info.st_size
+
     def _file_path(self, packet: MetadataCore, file: PacketFile):
         if self.config.core.use_file_store:
             dat = hash_parse(file.hash)
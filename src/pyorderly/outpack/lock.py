@@ -0,0 +1,116 @@
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None  # type: ignore
+
+# Several processes, possibly on different machines sharing a filesystem,
+# may use the same root at once. Most writes need no coordination: packet
+# metadata, location records and file store entries each live in their own
+# file, which is written under a temporary name and renamed into place (see
+# `write_atomic`), so concurrent writers can't corrupt each other's work and
+# writing the same file twice is harmless.
+#
+# Locks are only needed where a single file is read, modified and written
+# back, such as the configuration or the file store's packs. These use
+# advisory locks on dedicated lock files, which work across NFS on Linux.
+
+_POLL_INTERVAL = 0.05
+
+
+@contextmanager
+def file_lock(path, *, shared=False, timeout=None):
+    """
+    Hold an advisory lock on a file, creating it if needed.
+
+    Parameters
+    ----------
+    path :
+        The lock file.
+    shared :
+        If True, take a shared lock, which can be held by several processes
+        at once, but not at the same time as an exclusive lock. On Windows,
+        all locks are exclusive.
+    timeout :
+        The maximum number of seconds to wait for the lock. By default,
+        wait indefinitely.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+    try:
+        _acquire(fd, path, shared, timeout)
+        try:
+            yield
+        finally:
+            _release(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def root_lock(root_path, name, *, shared=False, timeout=None):
+    """
+    Hold one of a root's named locks.
+
+    Parameters
+    ----------
+    root_path :
+        The path to the root.
+    name :
+        The name of the lock. Operations that must not run at the same time
+        use the same name.
+    shared :
+        If True, take a shared lock.
+    timeout :
+        The maximum number of seconds to wait for the lock.
+    """
+    path = Path(root_path) / ".outpack" / "locks" / name
+    with file_lock(path, shared=shared, timeout=timeout):
+        yield
+
+
+def _acquire(fd, path, shared, timeout):
+    deadline = None if timeout is None else time.monotonic() + timeout
+    if fcntl is not None:
+        mode = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if deadline is None:
+            fcntl.flock(fd, mode)
+            return
+        while True:
+            try:
+                fcntl.flock(fd, mode | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                _wait(path, deadline)
+    else:  # pragma: no cover
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                _wait(path, deadline)
+
+
+def _release(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:  # pragma: no cover
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _wait(path, deadline):
+    if deadline is not None and time.monotonic() >= deadline:
+        msg = f"Timed out waiting for lock on '{path}'"
+        raise Exception(msg)
+    time.sleep(_POLL_INTERVAL)
@@ -1,15 +1,23 @@
+import sys
 from dataclasses import dataclass
+from functools import cached_property
 from pathlib import Path
 from typing import TypeAlias
 
-from dataclasses_json import DataClassJsonMixin
+from dataclasses_json import DataClassJsonMixin, dataclass_json
 
-from pyorderly.outpack.hash import hash_file
+from pyorderly.outpack.hash import hash_file, hash_files
 from pyorderly.outpack.tools import GitInfo
 
 
-@dataclass
-class PacketFile(DataClassJsonMixin):
+# The file and dependency records are held in large numbers by the index, so
+# they use slots to keep their memory footprint down. Deriving from
+# DataClassJsonMixin would give them a `__dict__` again, so they use the
+# `dataclass_json` decorator instead, which adds the same methods and
+# registers them as subclasses of the mixin.
+@dataclass_json
+@dataclass(slots=True)
+class PacketFile:
     path: str
     size: int
     hash: str
@@ -21,8 +29,19 @@ class PacketFile(DataClassJsonMixin):
         h = str(hash_file(f, hash_algorithm))
         return PacketFile(path, s, h)
 
-
-@dataclass
+    @staticmethod
+    def from_files(directory, paths, hash_algorithm, *, workers=None):
+        directory = Path(directory)
+        full = [directory.joinpath(p) for p in paths]
+        hashes = hash_files(full, hash_algorithm, workers=workers)
+        return [
+            PacketFile(p, f.stat().st_size, str(h))
+            for p, f, h in zip(paths, full, hashes, strict=True)
+        ]
+
+
+@dataclass_json
+@dataclass(slots=True)
 class PacketFileWithLocation(PacketFile):
     location: str
     packet_id: str
@@ -34,14 +53,16 @@ class PacketFileWithLocation(PacketFile):
         )
 
 
-@dataclass
-class PacketDependsPath(DataClassJsonMixin):
+@dataclass_json
+@dataclass(slots=True)
+class PacketDependsPath:
     here: str
     there: str
 
 
-@dataclass
-class PacketDepends(DataClassJsonMixin):
+@dataclass_json
+@dataclass(slots=True)
+class PacketDepends:
     packet: str
     query: str
     files: list[PacketDependsPath]
@@ -66,12 +87,25 @@ class MetadataCore(DataClassJsonMixin):
     git: GitInfo | None
     custom: dict | None
 
+    @cached_property
+    def path_index(self) -> dict[str, PacketFile]:
+        """
+        The packet's files, keyed by their path.
+
+        This is built the first time it is used, and is not updated if
+        `files` is modified afterwards.
+        """
+        return {f.path: f for f in self.files}
+
+    def file(self, name) -> PacketFile:
+        f = self.path_index.get(name)
+        if f is None:
+            msg = f"Packet {self.id} does not contain file '{name}'"
+            raise Exception(msg)
+        return f
+
     def file_hash(self, name):
-        for x in self.files:
-            if x.path == name:
-                return x.hash
-        msg = f"Packet {self.id} does not contain file '{name}'"
-        raise Exception(msg)
+        return self.file(name).hash
 
 
 @dataclass
@@ -83,9 +117,21 @@ class PacketLocation(DataClassJsonMixin):
 
 def read_metadata_core(path) -> MetadataCore:
     with open(path) as f:
-        return MetadataCore.from_json(f.read().strip())
+        meta = MetadataCore.from_json(f.read().strip())
+    _intern_strings(meta)
+    return meta
 
 
 def read_packet_location(path) -> PacketLocation:
     with open(path) as f:
         return PacketLocation.from_json(f.read().strip())
+
+
+def _intern_strings(meta: MetadataCore):
+    # Packets of the same report tend to have the same name and file paths,
+    # and unchanged files have the same hash across packets. Interning means
+    # the index holds a single copy of each of these strings.
+    meta.name = sys.intern(meta.name)
+    for f in meta.files:
+        f.path = sys.intern(f.path)
+        f.hash = sys.intern(f.hash)
@@ -20,13 +20,31 @@ from pyorderly.outpack.root import mark_known, root_open
 from pyorderly.outpack.schema import outpack_schema_version, validate
 from pyorderly.outpack.search import as_query, search_unique
 from pyorderly.outpack.tools import git_info
-from pyorderly.outpack.util import all_normal_files, as_posix_path
+from pyorderly.outpack.util import (
+    all_normal_files,
+    as_posix_path,
+    fsync_batch,
+    fsync_later,
+    write_atomic,
+)
+
+# Passed as the 'git' argument to `Packet` to have the packet detect its
+# own git metadata.
+GIT_DETECT = object()
 
 
 # TODO: most of these fields should be private.
 class Packet:
     def __init__(
-        self, root, path, name, *, parameters=None, id=None, locate=True
+        self,
+        root,
+        path,
+        name,
+        *,
+        parameters=None,
+        id=None,
+        locate=True,
+        git=GIT_DETECT,
     ):
         self.root = root_open(root, locate=locate)
         self.path = Path(path)
@@ -40,7 +58,9 @@ class Packet:
         self.depends = []
         self.files = []
         self.time = {"start": time.time()}
-        self.git = git_info(self.path)
+        # Callers creating many packets in separate processes can look this
+        # up once and pass it in, rather than each packet rediscovering it.
+        self.git = git_info(self.path) if git is GIT_DETECT else git
         self.custom = {}
         self.metadata = None
         self.immutable = {}
@@ -71,7 +91,10 @@ class Packet:
         for f in result.files.keys():
             self.mark_file_immutable(f)
 
-        d = PacketDepends(id, str(query), PacketDepends.files_from_dict(files))
+        # Directories have been expanded by `copy_files`, and we record the
+        # individual files that were used.
+        used = {here: there.path for here, there in result.files.items()}
+        d = PacketDepends(id, str(query), PacketDepends.files_from_dict(used))
         self.depends.append(d)
         return result
 
@@ -89,16 +112,18 @@ class Packet:
             raise Exception(msg)
         self.custom[key] = value
 
-    def end(self, *, succesful=True):
+    def end(self, *, succesful=True, workers=None):
         if self.metadata:
             msg = f"Packet '{id}' already ended"
             raise Exception(msg)
         self.time["end"] = time.time()
         hash_algorithm = self.root.config.core.hash_algorithm
-        self.files = [
-            PacketFile.from_file(self.path, as_posix_path(f), hash_algorithm)
-            for f in all_normal_files(self.path)
-        ]
+        self.files = PacketFile.from_files(
+            self.path,
+            as_posix_path(all_normal_files(self.path)),
+            hash_algorithm,
+            workers=workers,
+        )
         _check_immutable_files(self.files, self.immutable)
         self.metadata = self._build_metadata()
 
@@ -124,29 +149,68 @@ class Packet:
         )
 
 
-def insert_packet(root, path, meta):
+def insert_packet(root, path, meta, *, move=False, workers=None):
+    """
+    Insert a completed packet into an outpack root.
+
+    Parameters
+    ----------
+    root :
+        The root to insert the packet into.
+    path :
+        The directory containing the packet's files.
+    meta :
+        The packet's metadata, as returned by `Packet.end`.
+    move : bool
+        If True, files are moved out of `path` rather than copied. This is
+        much cheaper when `path` is on the same filesystem as the root, but
+        leaves `path` incomplete; it should only be used when `path` is
+        going to be deleted afterwards.
+    workers : int, optional
+        The maximum number of threads used to add files to the file store.
+    """
     # check that we have not already inserted this packet; in R we
     # look to see if it's unpacked but actually the issue is if it is
     # present as metadata at all.
-    if root.config.core.use_file_store:
-        for p in meta.files:
-            root.files.put(path / p.path, p.hash)
-
-    if root.config.core.path_archive:
-        dest = root.path / "archive" / meta.name / meta.id
-        for p in meta.files:
-            p_dest = dest / p.path
-            p_dest.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy(path / p.path, p_dest)
-
-    json = meta.to_json(separators=(",", ":"))
-    hash_meta = hash_string(json, root.config.core.hash_algorithm)
-    path_meta = root.path / ".outpack" / "metadata" / meta.id
-    path_meta.parent.mkdir(parents=True, exist_ok=True)
-    with open(path_meta, "w") as f:
-        f.write(json)
-
-    mark_known(root, meta.id, "local", hash_meta, time.time())
+    path_archive = root.config.core.path_archive
+
+    # The hashes in 'meta' were computed by 'Packet.end' from the very
+    # files we are about to store, so we don't validate them a second
+    # time on the way into the file store.
+    #
+    # If the packet is going into the archive too, the files still need
+    # to be there afterwards, so we can only move them into one of the two.
+    #
+    # Files are flushed to disk together once they have all been written,
+    # and before the packet is marked as known, so that a crash never leaves
+    # a packet that appears complete but whose files are missing.
+    with fsync_batch(workers=workers):
+        if root.config.core.use_file_store:
+            root.files.put_many(
+                [(path / p.path, p.hash) for p in meta.files],
+                move=move and not path_archive,
+                verify=False,
+                workers=workers,
+            )
+
+        if path_archive:
+            dest = root.path / path_archive / meta.name / meta.id
+            for p in meta.files:
+                p_dest = dest / p.path
+                p_dest.parent.mkdir(parents=True, exist_ok=True)
+                if move:
+                    shutil.move(path / p.path, p_dest)
+                else:
+                    shutil.copy(path / p.path, p_dest)
+                fsync_later(p_dest)
+
+        json = meta.to_json(separators=(",", ":"))
+        hash_meta = hash_string(json, root.config.core.hash_algorithm)
+        path_meta = root.path / ".outpack" / "metadata" / meta.id
+        write_atomic(path_meta, json)
+
+    with fsync_batch():
+        mark_known(root, meta.id, "local", hash_meta, time.time())
 
 
 def _check_immutable_files(files, immutable):
@@ -8,8 +8,14 @@ from pyorderly.outpack.filestore import FileStore
 from pyorderly.outpack.hash import hash_file, hash_parse
 from pyorderly.outpack.index import Index
 from pyorderly.outpack.metadata import PacketLocation
-from pyorderly.outpack.schema import validate
-from pyorderly.outpack.util import find_file_descend
+from pyorderly.outpack.schema import validate, validate_many
+from pyorderly.outpack.util import (
+    copy_file,
+    find_file_descend,
+    fsync_batch,
+    parallel_map,
+    write_atomic,
+)
 
 
 class OutpackRoot:
@@ -19,7 +25,10 @@ class OutpackRoot:
         self.path = Path(path)
         self.config = read_config(path)
         if self.config.core.use_file_store:
-            self.files = FileStore(self.path / ".outpack" / "files")
+            self.files = FileStore(
+                self.path / ".outpack" / "files",
+                compression=self.config.file_store_compression,
+            )
         self.index = Index(path)
 
     def export_file(self, id, there, here, dest):
@@ -27,7 +36,12 @@ class OutpackRoot:
         hash = meta.file_hash(there)
         dest = Path(dest)
         here_full = dest / here
-        if self.config.core.use_file_store:
+        # With both a file store and an archive, the file may only be in
+        # the archive if its packet was inserted by a process that opened
+        # the root before it was migrated to use the store.
+        if self.config.core.use_file_store and (
+            self.files.exists(hash) or not self.config.core.path_archive
+        ):
             try:
                 self.files.get(hash, here_full, overwrite=False)
             except FileNotFoundError as e:
@@ -46,6 +60,62 @@ class OutpackRoot:
             shutil.copyfile(src, here_full)
         return here
 
+    def export_files(self, files, dest, *, workers=None):
+        """
+        Copy several files out of the root into a directory.
+
+        The files are located in a single pass, and copied concurrently.
+
+        Parameters
+        ----------
+        files : dict[str, PacketFile]
+            The files to copy, keyed by their destination path relative to
+            `dest`.
+        dest :
+            The directory to copy files into.
+        workers : int, optional
+            The maximum number of threads used to verify and copy files.
+
+        Returns
+        -------
+        The entries of `files` which could not be found locally.
+        """
+        dest = Path(dest)
+        # Files in the store are marked with None, and files in the archive
+        # with their path.
+        found = {}
+        if self.config.core.use_file_store:
+            exists = self.files.exists_many([f.hash for f in files.values()])
+            found = {
+                here: None
+                for here, x in zip(files.keys(), exists, strict=True)
+                if x
+            }
+
+        # As in `export_file`, files may be in the archive alone.
+        rest = {here: f for here, f in files.items() if here not in found}
+        if rest and self.config.core.path_archive:
+            paths = find_files_by_hash(
+                self, [f.hash for f in rest.values()], workers=workers
+            )
+            found.update(
+                (here, paths[f.hash])
+                for here, f in rest.items()
+                if f.hash in paths
+            )
+
+        def export(here):
+            here_full = dest / here
+            src = found[here]
+            if src is None:
+                self.files.get(files[here].hash, here_full, overwrite=False)
+            else:
+                here_full.parent.mkdir(parents=True, exist_ok=True)
+                copy_file(src, here_full)
+
+        parallel_map(export, found.keys(), workers=workers)
+        return {here: f for here, f in files.items() if here not in found}
+
 
 def root_open(
     path: OutpackRoot | str | os.PathLike | None, *, locate: bool = False
@@ -75,28 +145,62 @@ def root_open(
 
 
 def find_file_by_hash(root, hash):
+    return find_files_by_hash(root, [hash], workers=1).get(hash)
+
+
+def find_files_by_hash(root, hashes, *, workers=None):
+    """
+    Find files in the archive with the given hashes.
+
+    Candidate files are found with a single scan of the index, and are
+    then verified, as their contents could have been modified since the
+    packet was created.
+
+    Returns
+    -------
+    A dictionary mapping each hash that was found to the path of a file
+    with that hash.
+    """
     path_archive = root.path / root.config.core.path_archive
-    hash_parsed = hash_parse(hash)
+    wanted = set(hashes)
+    candidates = {}
     for id in root.index.unpacked():
         meta = root.index.metadata(id)
         for f in meta.files:
-            if f.hash == hash:
-                path = path_archive / meta.name / meta.id / f.path
-                if hash_file(path, hash_parsed.algorithm) == hash_parsed:
-                    return path
-                else:
-                    msg = (
-                        f"Rejecting file from archive '{f.path}' "
-                        f"in '{meta.name}/{meta.id}'"
-                    )
-                    print(msg)
-    return None
+            if f.hash in wanted:
+                candidates.setdefault(f.hash, []).append((meta, f))
+
+    def find(hash):
+        hash_parsed = hash_parse(hash)
+        for meta, f in candidates[hash]:
+            path = path_archive / meta.name / meta.id / f.path
+            if hash_file(path, hash_parsed.algorithm) == hash_parsed:
+                return path
+            else:
+                msg = (
+                    f"Rejecting file from archive '{f.path}' "
+                    f"in '{meta.name}/{meta.id}'"
+                )
+                print(msg)
+        return None
+
+    found = parallel_map(find, candidates.keys(), workers=workers)
+    return {h: p for h, p in zip(candidates.keys(), found, strict=True) if p}
 
 
 def mark_known(root, packet_id, location, hash, time):
     dat = PacketLocation(packet_id, time, str(hash))
     validate(dat.to_dict(), "outpack/location.json")
-    dest = root.path / ".outpack" / "location" / location / packet_id
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    with open(dest, "w") as f:
-        f.write(dat.to_json(separators=(",", ":")))
+    _write_packet_location(root, location, dat)
+
+
+def mark_known_many(root, location, packets: list[PacketLocation]):
+    validate_many([p.to_dict() for p in packets], "outpack/location.json")
+    with fsync_batch():
+        for dat in packets:
+            _write_packet_location(root, location, dat)
+
+
+def _write_packet_location(root, location, dat: PacketLocation):
+    dest = root.path / ".outpack" / "location" / location / dat.packet
+    write_atomic(dest, dat.to_json(separators=(",", ":")))
@@ -1,28 +1,69 @@
+import functools
 import json
 import os
 import os.path
 
 import importlib_resources
-from jsonschema import Draft7Validator
-from referencing import Registry, Resource
 
 
 def validate(instance, schema_name):
-    root = os.path.dirname(schema_name)
+    _validator(schema_name).validate(instance)
+
+
+def validate_many(instances, schema_name):
+    """
+    Validate several instances against the same schema.
+
+    This raises an exception for the first instance that fails
+    validation.
+    """
+    validator = _validator(schema_name)
+    for instance in instances:
+        validator.validate(instance)
+
+
+# Building a validator involves reading and parsing the schema and every
+# schema it refers to, which costs far more than validating the small
+# documents we usually deal with. Validators are immutable, so we build
+# each one once and keep it for the lifetime of the process.
+@functools.cache
+def _validator(schema_name):
+    # jsonschema is imported on first use, as it takes a noticeable time to
+    # load and many processes (such as report sandboxes that fail early)
+    # never validate anything.
+    from jsonschema import Draft7Validator  # noqa: PLC0415
+
+    schema = json.loads(read_schema(schema_name))
+    registry = _registry(os.path.dirname(schema_name))
+    return Draft7Validator(schema, registry=registry)
+
+
+@functools.cache
+def _registry(root):
+    from referencing import Registry  # noqa: PLC0415
 
     def retrieve(path):
         return retrieve_from_filesystem(os.path.join(root, path))
 
-    schema = json.loads(read_schema(schema_name))
-    validator = Draft7Validator(schema, registry=Registry(retrieve=retrieve))
-    validator.validate(instance)
+    # Without preloading the schemas, the validator would retrieve every
+    # referenced schema again each time it is used.
+    path = importlib_resources.files("pyorderly.outpack.schema").joinpath(root)
+    resources = [
+        (p.name, retrieve(p.name))
+        for p in path.iterdir()
+        if p.name.endswith(".json")
+    ]
+    return Registry(retrieve=retrieve).with_resources(resources)
 
 
 def retrieve_from_filesystem(path: str):
+    from referencing import Resource  # noqa: PLC0415
+
     contents = json.loads(read_schema(path))
     return Resource.from_contents(contents)
 
 
+@functools.cache
 def outpack_schema_version():
     data = read_schema("outpack/config.json")
     return json.loads(data)["version"]
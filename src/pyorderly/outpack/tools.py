@@ -1,6 +1,7 @@
+import dataclasses
+import os
 from dataclasses import dataclass
 
-import pygit2
 from dataclasses_json import dataclass_json
 
 
@@ -12,12 +13,53 @@ class GitInfo:
     url: list[str]
 
 
+# Opening a repository and listing its remotes is comparatively slow, and
+# when running many packets from the same checkout the answer rarely
+# changes. We remember the result for each repository, along with a
+# fingerprint of the files that change whenever the answer might.
+_git_info_cache: dict[str, tuple[tuple, GitInfo]] = {}
+
+
 def git_info(path):
-    repo = pygit2.discover_repository(path)
-    if not repo:
+    # pygit2 is slow to import and only needed once per packet, so we
+    # don't load it until then.
+    import pygit2  # noqa: PLC0415
+
+    repo_path = pygit2.discover_repository(path)
+    if not repo_path:
         return None
-    repo = pygit2.Repository(repo)
-    sha = str(repo.head.target)
-    branch = repo.head.shorthand
-    url = [x.url for x in repo.remotes]
-    return GitInfo(sha, branch, url)
+
+    key = _git_info_key(repo_path)
+    cached = _git_info_cache.get(repo_path)
+    if cached is None or cached[0] != key:
+        repo = pygit2.Repository(repo_path)
+        sha = str(repo.head.target)
+        branch = repo.head.shorthand
+        url = [x.url for x in repo.remotes]
+        cached = (key, GitInfo(sha, branch, url))
+        _git_info_cache[repo_path] = cached
+
+    info = cached[1]
+    return dataclasses.replace(info, url=list(info.url))
+
+
+def _git_info_key(repo_path):
+    # Commits, checkouts and resets all append to the HEAD reflog. We also
+    # look at HEAD itself and the branch it points to, in case reflogs are
+    # disabled, and at the config file, which holds the remotes.
+    files = ["HEAD", "logs/HEAD", "config", "packed-refs"]
+    try:
+        with open(os.path.join(repo_path, "HEAD")) as f:
+            head = f.read().strip()
+    except OSError:
+        head = None
+    if head is not None and head.startswith("ref: "):
+        files.append(head.removeprefix("ref: "))
+
+    result = [head]
+    for f in files:
+        try:
+            result.append(os.stat(os.path.join(repo_path, f)).st_mtime_ns)
+        except OSError:
+            result.append(None)
+    return tuple(result)
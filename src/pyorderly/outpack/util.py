@@ -1,12 +1,25 @@
 import datetime
 import os
+import secrets
+import shutil
 import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from itertools import filterfalse, tee
 from pathlib import Path, PurePath
 from typing import TypeVar
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # Not available on Windows, where we never attempt to clone files.
+    fcntl = None  # type: ignore
+
+# From linux/fs.h; this is the ioctl used by `cp --reflink`.
+FICLONE = 0x40049409
+
 
 def find_file_descend(filename, path):
     path = Path(path)
@@ -48,6 +61,43 @@ def all_normal_files(path):
     return result
 
 
+def copy_file(src, dst):
+    """
+    Copy a file's contents, sharing storage with the original if possible.
+
+    On filesystems that support reflinks (such as btrfs and XFS), the new
+    file initially shares all of its data blocks with `src`, and blocks
+    are only duplicated as either file gets modified. This makes copying
+    large files close to free, while the two files remain fully
+    independent. Elsewhere, this falls back to an ordinary copy.
+    """
+    if not _reflink(src, dst):
+        shutil.copyfile(src, dst)
+
+
+def clone_file(src, dst):
+    """
+    Copy a file and its metadata, sharing storage if possible.
+
+    This is like `shutil.copy2`, but makes the copy using `copy_file`.
+    """
+    copy_file(src, dst)
+    shutil.copystat(src, dst)
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        return False
+    with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+        try:
+            fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+        except OSError:
+            # Typically EOPNOTSUPP or EXDEV. 'dst' is left empty and will be
+            # overwritten by the caller.
+            return False
+    return True
+
+
 @contextmanager
 def transient_working_directory(path):
     origin = os.getcwd()
@@ -173,6 +223,211 @@ def partition(pred, iterable):
     return list(filter(pred, t1)), list(filterfalse(pred, t2))
 
 
+def parallel_map(f, items, *, workers=None):
+    """
+    Apply a function to each element of a list, using a pool of threads.
+
+    This is intended for I/O bound work such as hashing or copying files,
+    where the underlying operations release the GIL. Results are returned
+    in the same order as the input, regardless of the order in which they
+    complete.
+
+    Parameters
+    ----------
+    f :
+        The function to apply.
+    items :
+        The values to apply `f` to.
+    workers : int, optional
+        The maximum number of threads to use. If None, the default of
+        `concurrent.futures.ThreadPoolExecutor` is used. A value of 1
+        disables the use of threads entirely.
+    """
+    items = list(items)
+    if workers == 1 or len(items) <= 1:
+        return [f(x) for x in items]
+    batch = _fsync_current()
+    if batch is not None:
+        f = _in_fsync_batch(f, batch)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(f, items))
+
+
+def write_atomic(path, contents: str | bytes):
+    """
+    Write a file, such that readers only ever see its complete contents.
+
+    The contents are written to a temporary file in the same directory,
+    flushed to disk, and then renamed into place. Even if the machine
+    crashes, the file is either missing or complete, and never truncated.
+
+    Within `fsync_batch`, the file only appears once the batch completes.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    mode = "xb" if isinstance(contents, bytes) else "x"
+    # The temporary file is hidden, so that anything listing the directory
+    # doesn't mistake a partially written file for a real one.
+    tmp = path.with_name(f".{path.name}.{secrets.token_hex(8)}")
+    try:
+        with open(tmp, mode) as f:
+            f.write(contents)
+        with fsync_batch():
+            replace_later(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+class _FsyncBatch:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.paths = set()
+        self.renames = []
+
+    def flush(self, workers):
+        pending = [src for src, _, _ in self.renames]
+        parallel_map(_fsync_file, [*self.paths, *pending], workers=workers)
+        for src, dst, _ in self.renames:
+            os.replace(src, dst)
+        directories = {p.parent for p in self.paths}
+        directories.update(dst.parent for _, dst, _ in self.renames)
+        parallel_map(_fsync_directory, directories, workers=workers)
+
+    def discard(self, workers):
+        # Renames that were asked to be kept may hold the only copy of a
+        # file, so are completed anyway.
+        kept = []
+        for src, dst, keep in self.renames:
+            if keep:
+                kept.append((src, dst, keep))
+            else:
+                src.unlink(missing_ok=True)
+        self.renames = kept
+        self.flush(workers)
+
+
+_fsync_state = threading.local()
+
+
+def _fsync_current():
+    return getattr(_fsync_state, "batch", None)
+
+
+@contextmanager
+def fsync_batch(*, workers=None):
+    """
+    Make the files written within a block durable once it completes.
+
+    Flushing each file to disk as it is written is slow. Within this block,
+    files written with `write_atomic` or `replace_later`, or registered
+    with `fsync_later`, are instead all flushed when the block exits
+    successfully, followed by the directories containing them, each once.
+    If the block fails, files written with `write_atomic` are discarded.
+
+    A batch belongs to the thread that started it, and is carried into
+    the threads used by `parallel_map`. Batches may be nested, in which
+    case the inner one joins the outer, and everything is flushed when
+    the outermost one exits.
+
+    Parameters
+    ----------
+    workers : int, optional
+        The maximum number of threads used to flush files.
+    """
+    if _fsync_current() is not None:
+        yield
+        return
+
+    batch = _FsyncBatch()
+    _fsync_state.batch = batch
+    try:
+        yield
+    except BaseException:
+        batch.discard(workers)
+        raise
+    finally:
+        _fsync_state.batch = None
+    batch.flush(workers)
+
+
+def fsync_later(path):
+    """Flush a file to disk when the current `fsync_batch` exits, if any."""
+    batch = _fsync_current()
+    if batch is not None:
+        with batch.lock:
+            batch.paths.add(Path(path))
+
+
+def replace_later(src, dst, *, keep=False):
+    """
+    Rename a file over another, once it has been flushed to disk.
+
+    Within `fsync_batch`, the rename happens when the batch completes, so
+    `dst` never refers to contents that aren't yet durable. Otherwise the
+    file is renamed straight away, without being flushed.
+
+    Parameters
+    ----------
+    src :
+        The file to rename.
+    dst :
+        The name to give it.
+    keep :
+        If True, the rename happens even if the batch fails, rather than
+        `src` being removed. This is needed where `src` may be the only
+        copy of its contents, such as a file moved into the file store.
+    """
+    src = Path(src)
+    dst = Path(dst)
+    batch = _fsync_current()
+    if batch is None:
+        os.replace(src, dst)
+        return
+    # Moved aside, as the caller may remove 'src' once we return.
+    pending = src.with_name(f"{src.name}.pending")
+    os.replace(src, pending)
+    with batch.lock:
+        batch.renames.append((pending, dst, keep))
+
+
+def _in_fsync_batch(f, batch):
+    def wrapped(x):
+        _fsync_state.batch = batch
+        try:
+            return f(x)
+        finally:
+            _fsync_state.batch = None
+
+    return wrapped
+
+
+def _fsync_file(path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        # Moved or removed since it was written; whoever did that is
+        # responsible for it now.
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        # Windows can't flush files opened for reading only, and we can't
+        # open the read-only files in the file store any other way.
+        if os.name != "nt":
+            raise
+    finally:
+        os.close(fd)
+
+
+def _fsync_directory(path):
+    # This makes renames within the directory durable. Windows doesn't
+    # support opening directories, and doesn't need it.
+    if os.name == "nt":
+        return
+    _fsync_file(path)
+
+
 @contextmanager
 def openable_temporary_file(*, mode: str = "w+b", dir: str | None = None):
     # On Windows, a NamedTemporaryFile with `delete=True` cannot be reopened,
@@ -0,0 +1,151 @@
+import threading
+import time
+from dataclasses import dataclass, field
+
+import humanize
+
+from pyorderly.outpack.hash import hash_file, hash_parse
+from pyorderly.outpack.root import OutpackRoot, root_open
+from pyorderly.outpack.util import parallel_map, pl
+
+
+@dataclass
+class VerifyResult:
+    """
+    The outcome of verifying the files of a root.
+
+    Attributes
+    ----------
+    files :
+        The number of files that were checked.
+    size :
+        The total size of the files that were checked, in bytes.
+    missing :
+        The files that should exist but don't. Files in the archive are
+        given by their path relative to the root, and files in the file
+        store by their hash.
+    corrupt :
+        The files whose contents don't match their hash, described in the
+        same way as `missing`.
+    """
+
+    files: int = 0
+    size: int = 0
+    missing: list[str] = field(default_factory=list)
+    corrupt: list[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.missing and not self.corrupt
+
+
+def outpack_verify(
+    root: OutpackRoot | str | None = None,
+    *,
+    workers: int | None = None,
+    progress_interval: float = 5,
+    locate: bool = True,
+) -> VerifyResult:
+    """
+    Check that the files of every unpacked packet match their metadata.
+
+    Each file used by a packet is read in full and hashed, both from the
+    archive and from the file store, whichever the root has. Progress is
+    printed periodically, as this can take a long time for a large root.
+
+    Parameters
+    ----------
+    root :
+        The path to the root, or an already open root.
+    workers :
+        The maximum number of threads used to hash files.
+    progress_interval :
+        The minimum number of seconds between progress messages.
+    locate :
+        Whether to search parent directories of `root` for the root.
+
+    Returns
+    -------
+    A description of the files that were checked, and any problems found.
+    """
+    root = root_open(root, locate=locate)
+
+    # Each check is a (name, hash, size, path) tuple, where 'path' is None
+    # for files in the store.
+    checks = []
+    hashes = {}
+    path_archive = root.config.core.path_archive
+    for id in root.index.unpacked():
+        meta = root.index.metadata(id)
+        for f in meta.files:
+            if path_archive is not None:
+                path = root.path / path_archive / meta.name / id / f.path
+                name = f"{path_archive}/{meta.name}/{id}/{f.path}"
+                checks.append((name, f.hash, f.size, path))
+            hashes[f.hash] = f.size
+    if root.files is not None:
+        checks.extend((h, h, size, None) for h, size in hashes.items())
+
+    result = VerifyResult()
+    progress = _Progress(checks, progress_interval)
+
+    def check(item):
+        name, expected, size, path = item
+        status = _check_file(root, expected, path)
+        progress.update(size)
+        return name, size, status
+
+    for name, size, status in parallel_map(check, checks, workers=workers):
+        if status == "missing":
+            result.missing.append(name)
+        else:
+            result.files += 1
+            result.size += size
+            if status == "corrupt":
+                result.corrupt.append(name)
+
+    print(
+        f"Verified {result.files} {pl(result.files, 'file')} "
+        f"({humanize.naturalsize(result.size)}): "
+        f"{len(result.missing)} missing, {len(result.corrupt)} corrupt"
+    )
+    return result
+
+
+def _check_file(root, expected, path):
+    expected = hash_parse(expected)
+    try:
+        if path is None:
+            with root.files.uncompressed(expected) as p:
+                found = hash_file(p, expected.algorithm)
+        else:
+            found = hash_file(path, expected.algorithm)
+    except FileNotFoundError:
+        return "missing"
+    return "ok" if found == expected else "corrupt"
+
+
+class _Progress:
+    def __init__(self, checks, interval):
+        self._files = len(checks)
+        self._size = sum(size for _, _, size, _ in checks)
+        self._interval = interval
+        self._done_files = 0
+        self._done_size = 0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def update(self, size):
+        with self._lock:
+            self._done_files += 1
+            self._done_size += size
+            now = time.monotonic()
+            if now - self._last < self._interval:
+                return
+            self._last = now
+            print(
+                f"Checked {self._done_files}/{self._files} "
+                f"{pl(self._files, 'file')} "
+                f"({humanize.naturalsize(self._done_size)}/"
+                f"{humanize.naturalsize(self._size)})"
+            )
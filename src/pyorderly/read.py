@@ -1,29 +1,119 @@
 import ast
+import copy
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from pyorderly.outpack.hash import hash_string
 
 
 # In the R version of this function we do a more involved read, trying
-# to handle "static" versions of all of the orderly core
-# functions. However,we then never actually used that for anything, so
-# to avoid overcomplication we'll do the least possible here which is
-# just to read the parameters from the file, verify that it is only
-# called once, and that is called at the top-level.
-#
-# The return value does nod at future extension though.
+# to handle "static" versions of all of the orderly core functions. Here
+# we read the parameters, verifying that they are declared only once and
+# at the top-level, along with any resources, shared resources, artefacts
+# and dependencies declared at the top-level with literal arguments. Each
+# script is parsed once per version of its contents, and the result is
+# cached; callers get their own copies, so they can't modify the cache.
 def orderly_read(path):
-    src = path.read_text()
-    return _read_py(src)
+    v = _read_cached(path)
+    return {"parameters": copy.deepcopy(v.parameters or {})}
+
+
+def orderly_read_static(path):
+    """Read the static declarations of a report.
+
+    This finds the calls to `pyorderly.parameters`, `pyorderly.resource`,
+    `pyorderly.shared_resource`, `pyorderly.artefact` and
+    `pyorderly.dependency` made at the top-level of a report script,
+    without running it. Calls whose arguments are not
+    literal values are skipped, since they can only be resolved by
+    running the report.
+
+    Parameters
+    ----------
+    path : Path
+        The path to the report script.
+
+    Returns
+    -------
+    A dictionary with entries `parameters`, `resources`, `shared_resources`,
+    `artefacts` and `dependencies`.
+    """
+    v = _read_cached(path)
+    # The parsed script is cached, so callers get their own copy to modify.
+    return copy.deepcopy(
+        {
+            "parameters": v.parameters or {},
+            "resources": v.resources,
+            "shared_resources": v.shared_resources,
+            "artefacts": v.artefacts,
+            "dependencies": v.dependencies,
+        }
+    )
 
 
 def _read_py(src):
+    v = _parse_py(src)
+    return {"parameters": v.parameters or {}}
+
+
+def _parse_py(src):
     module = ast.parse(src)
     v = Visitor()
     v.read_body(module.body)
-    return {"parameters": v.parameters or {}}
+    return v
+
+
+@dataclass
+class _CacheEntry:
+    size: int
+    mtime: int
+    hash: str
+    time: float
+    visitor: "Visitor"
+
+
+# Parsed report scripts, keyed by their absolute path. Running a report
+# repeatedly (as in a parameter sweep) would otherwise re-read and re-parse
+# the script every time.
+_cache: dict[Path, _CacheEntry] = {}
+
+
+def _read_cached(path):
+    path = Path(path).absolute()
+    st = path.stat()
+    entry = _cache.get(path)
+
+    # As in git's index, we only trust an unchanged size and mtime if the
+    # file was last modified comfortably before we read it; otherwise an
+    # edit made within the filesystem's timestamp resolution could go
+    # unnoticed. In that case we fall back to comparing contents.
+    if (
+        entry is not None
+        and entry.size == st.st_size
+        and entry.mtime == st.st_mtime_ns
+        and st.st_mtime < entry.time - 1
+    ):
+        return entry.visitor
+
+    now = time.time()
+    src = path.read_text()
+    h = str(hash_string(src, "sha256"))
+    if entry is not None and entry.hash == h:
+        visitor = entry.visitor
+    else:
+        visitor = _parse_py(src)
+    _cache[path] = _CacheEntry(st.st_size, st.st_mtime_ns, h, now, visitor)
+    return visitor
 
 
 class Visitor:
     def __init__(self):
         self.parameters = None
+        self.resources = []
+        self.shared_resources = {}
+        self.artefacts = []
+        self.dependencies = []
 
     def read_body(self, stmts):
         for stmt in stmts:
@@ -39,6 +129,14 @@ class Visitor:
         name = _match_orderly_call(expr)
         if name == "parameters":
             self._read_parameters(expr)
+        elif name == "resource":
+            self._read_resource(expr)
+        elif name == "shared_resource":
+            self._read_shared_resource(expr)
+        elif name == "artefact":
+            self._read_artefact(expr)
+        elif name == "dependency":
+            self._read_dependency(expr)
 
     def _read_parameters(self, call):
         if call.args:
@@ -66,6 +164,77 @@ class Visitor:
         else:
             self.parameters = data
 
+    def _read_resource(self, call):
+        args = _literal_arguments(call, ["files"])
+        files = _as_path_list(args["files"]) if args else None
+        if files is not None:
+            self.resources.extend(files)
+
+    def _read_shared_resource(self, call):
+        args = _literal_arguments(call, ["files"])
+        files = _as_path_mapping(args["files"]) if args else None
+        if files is not None:
+            self.shared_resources.update(files)
+
+    def _read_artefact(self, call):
+        args = _literal_arguments(call, ["name", "files"])
+        files = _as_path_list(args["files"]) if args else None
+        if files is not None and isinstance(args["name"], str):
+            self.artefacts.append({"name": args["name"], "files": files})
+
+    def _read_dependency(self, call):
+        args = _literal_arguments(call, ["name", "query", "files"])
+        files = _as_path_mapping(args["files"]) if args else None
+        if (
+            files is not None
+            and isinstance(args["name"], (str, type(None)))
+            and isinstance(args["query"], str)
+        ):
+            self.dependencies.append(
+                {"name": args["name"], "query": args["query"], "files": files}
+            )
+
+
+def _literal_arguments(call, names):
+    """Match the arguments of a call, requiring that they be literals.
+
+    Returns None if any argument is missing, unexpected or isn't a literal.
+    """
+    if len(call.args) > len(names):
+        return None
+    nodes = dict(zip(names, call.args, strict=False))
+    for kw in call.keywords:
+        if kw.arg is None or kw.arg not in names or kw.arg in nodes:
+            return None
+        nodes[kw.arg] = kw.value
+    if nodes.keys() != set(names):
+        return None
+    try:
+        return {k: ast.literal_eval(v) for k, v in nodes.items()}
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_str_list(x):
+    return isinstance(x, (list, tuple)) and all(isinstance(f, str) for f in x)
+
+
+def _as_path_list(files):
+    if isinstance(files, str):
+        return [files]
+    elif _is_str_list(files):
+        return list(files)
+    else:
+        return None
+
+
+def _as_path_mapping(files):
+    if isinstance(files, dict):
+        ok = _is_str_list(list(files.keys()) + list(files.values()))
+        return files if ok else None
+    files = _as_path_list(files)
+    return None if files is None else {f: f for f in files}
+
 
 def _is_identifier(node, value):
     return isinstance(node, ast.Name) and node.id == value
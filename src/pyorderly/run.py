@@ -1,21 +1,64 @@
 import runpy
 import shutil
+import threading
 from pathlib import Path
 
 from pyorderly.core import Description
 from pyorderly.current import ActiveOrderlyContext, OrderlyCustomMetadata
+from pyorderly.outpack.copy_files import _plan_copy_files
 from pyorderly.outpack.ids import outpack_id
+from pyorderly.outpack.index import IndexData
+from pyorderly.outpack.location_pull import (
+    location_build_pull_plan,
+    location_pull_files,
+    outpack_location_pull_packet,
+)
 from pyorderly.outpack.metadata import MetadataCore
 from pyorderly.outpack.packet import Packet, insert_packet
 from pyorderly.outpack.root import root_open
 from pyorderly.outpack.sandbox import run_in_sandbox
-from pyorderly.outpack.util import all_normal_files
-from pyorderly.read import orderly_read
+from pyorderly.outpack.search import search_unique
+from pyorderly.outpack.search_options import SearchOptions
+from pyorderly.outpack.tools import git_info
+from pyorderly.outpack.util import all_normal_files, clone_file
+from pyorderly.read import orderly_read, orderly_read_static
 
 
 def orderly_run(
-    name, *, parameters=None, search_options=None, root=None, locate=True
+    name,
+    *,
+    parameters=None,
+    search_options=None,
+    root=None,
+    locate=True,
+    prefetch=False,
 ):
+    """
+    Run a report, creating a new packet.
+
+    Parameters
+    ----------
+    name : str
+        The name of the report to run.
+    parameters : dict, optional
+        Values for the report's parameters.
+    search_options : SearchOptions, optional
+        Options used to resolve the report's dependencies.
+    root : optional
+        The orderly root, or a path to it.
+    locate : bool
+        Whether to search parent directories of `root` for the root.
+    prefetch : bool
+        If True, dependencies that can be determined without running the
+        report are resolved up front, and any of their files which are only
+        available remotely are pulled while the report's sources are being
+        copied. The report's own `pyorderly.dependency` calls then only need
+        to copy local files.
+
+    Returns
+    -------
+    The id of the new packet.
+    """
     root = root_open(root, locate=locate)
 
     path_src, entrypoint = _validate_src_directory(name, root)
@@ -27,12 +70,33 @@ def orderly_run(
     path_dest = root.path / "draft" / name / packet_id
     path_dest.mkdir(parents=True)
 
+    if prefetch:
+        fetch = threading.Thread(
+            target=_prefetch_dependencies,
+            args=(root, path_src / entrypoint, parameters, search_options),
+        )
+        fetch.start()
+
     _copy_resources_implicit(path_src, path_dest)
 
-    metadata = run_in_sandbox(
+    # The report's own dependency calls may need the same files, so we must
+    # not start it while they're still being written to the file store.
+    if prefetch:
+        fetch.join()
+
+    # git_info caches its result per repository, which only helps if we
+    # look it up here rather than in a fresh sandbox process each time.
+    git = git_info(path_dest)
+
+    # The child gets our root object, rather than just its path, so that it
+    # starts with the already parsed configuration and whatever metadata
+    # we have indexed so far instead of re-reading all of '.outpack'. In
+    # return we pick up anything the child added to the index, so that
+    # subsequent runs against the same root start warm too.
+    metadata, index = run_in_sandbox(
         _packet_builder,
         args=(
-            root.path,
+            root,
             packet_id,
             name,
             path_dest,
@@ -40,11 +104,15 @@ def orderly_run(
             entrypoint,
             parameters,
             search_options,
+            git,
         ),
         cwd=path_dest,
     )
+    root.index.data = index
 
-    insert_packet(root, path_dest, metadata)
+    # The draft is deleted straight after, so we can move files out of it
+    # rather than copying them.
+    insert_packet(root, path_dest, metadata, move=True)
 
     # This is intentionally not in a `try-finally` block. If creating the
     # packet fails and an exception was raised, we want to keep the packet in
@@ -55,8 +123,8 @@ def orderly_run(
 
 
 def _packet_builder(
-    root, id, name, path, path_src, entrypoint, parameters, search_options
-) -> MetadataCore:
+    root, id, name, path, path_src, entrypoint, parameters, search_options, git
+) -> tuple[MetadataCore, IndexData]:
     root = root_open(root, locate=False)
     packet = Packet(
         root,
@@ -65,6 +133,7 @@ def _packet_builder(
         id=id,
         locate=False,
         parameters=parameters,
+        git=git,
     )
 
     packet.mark_file_immutable(entrypoint)
@@ -79,7 +148,7 @@ def _packet_builder(
         raise
 
     packet.add_custom_metadata("orderly", _custom_metadata(entrypoint, orderly))
-    return packet.end()
+    return packet.end(), root.index.data
 
 
 def _run_report_script(
@@ -152,11 +221,62 @@ def _validate_parameters(given, defaults):
     return ret
 
 
+# Source directories can contain large static inputs, so where the
+# filesystem allows it we clone files rather than copying their contents.
+# We don't use hardlinks here: a report writing to one of these files in
+# place would then silently modify the report's source too.
 def _copy_resources_implicit(src, dest):
     for p in all_normal_files(src):
         p_dest = dest / p
         p_dest.parent.mkdir(parents=True, exist_ok=True)
-        shutil.copy2(src / p, p_dest)
+        clone_file(src / p, p_dest)
+
+
+def _prefetch_dependencies(root, path, parameters, search_options):
+    options = SearchOptions.create(search_options)
+    if not options.allow_remote:
+        return
+
+    try:
+        ids = {}
+        for d in orderly_read_static(path)["dependencies"]:
+            id = search_unique(
+                d["query"], root=root, options=options, this=parameters
+            )
+            ids.setdefault(id, {}).update(d["files"])
+
+        missing = [id for id in ids if id not in root.index.unpacked()]
+        if not missing:
+            return
+
+        # These mirror what 'Packet.use_dependency' would do: either pull
+        # the whole packet, or just the files it uses. Without a file store
+        # there is nowhere to keep individual files, so we leave those to
+        # the report.
+        if root.config.core.require_complete_tree:
+            outpack_location_pull_packet(missing, options=options, root=root)
+        elif root.files is not None:
+            files = {
+                id: [
+                    f.hash
+                    for f in _plan_copy_files(root, id, ids[id]).files.values()
+                ]
+                for id in missing
+            }
+            plan = location_build_pull_plan(
+                missing,
+                options.location,
+                files=files,
+                recursive=False,
+                root=root,
+            )
+            with location_pull_files(plan.files, root):
+                pass
+
+    except Exception as e:
+        # Any problem here will happen again, and be reported properly,
+        # when the report itself asks for the dependency.
+        print(f"Failed to prefetch dependencies: {e}")
 
 
 def _custom_metadata(entrypoint, orderly):
@@ -43,7 +43,7 @@ class SSHServer(AbstractContextManager):
         return (
             f"[127.0.0.1]:{self.port}",
             "ssh-rsa",
-            base64.b64encode(self.host_key.asbytes()),
+            base64.b64encode(self.host_key.asbytes()).decode(),
         )
 
     def __enter__(self):
@@ -0,0 +1,80 @@
+import pytest
+
+from pyorderly.graph import _query_names, orderly_report_graph
+from pyorderly.outpack.search import as_query
+
+from .. import helpers
+
+
+def write_report(root, name, code):
+    helpers.write_file(root.path / "src" / name / f"{name}.py", code)
+
+
+def dependency(query, files="result.txt"):
+    return f"pyorderly.dependency(None, {query!r}, {files!r})\n"
+
+
+def test_can_find_names_in_queries():
+    def names(query):
+        return _query_names(as_query(query).node)
+
+    assert names("latest") == set()
+    assert names("latest(name == 'a')") == {"a"}
+    assert names("single('a' == name)") == {"a"}
+    assert names("latest(name == 'a' && parameter:x == 1)") == {"a"}
+    assert names("latest(name == 'a' || (name == 'b'))") == {"a", "b"}
+    assert names("latest(!(name == 'a'))") == set()
+    assert names("latest(name != 'a')") == set()
+    assert names("20230807-152344-ee606dce") == set()
+
+
+def test_can_build_report_graph(tmp_path):
+    root = helpers.create_temporary_root(tmp_path)
+    write_report(root, "a", "pyorderly.parameters(x=1)\n")
+    write_report(root, "b", dependency("latest(name == 'a')"))
+    write_report(root, "c", dependency("latest(name == 'a')"))
+    write_report(
+        root,
+        "d",
+        dependency("latest(name == 'b')") + dependency("latest(name == 'c')"),
+    )
+    write_report(root, "e", dependency("latest(name == 'remote')"))
+    (root.path / "src" / "notareport").mkdir()
+
+    graph = orderly_report_graph(root)
+    assert list(graph.reports.keys()) == ["a", "b", "c", "d", "e"]
+    assert graph.reports["a"]["parameters"] == {"x": 1}
+    assert graph.upstream == {
+        "a": set(),
+        "b": {"a"},
+        "c": {"a"},
+        "d": {"b", "c"},
+        "e": {"remote"},
+    }
+    assert graph.downstream("a") == {"b", "c"}
+
+    assert graph.batches() == [["a", "e"], ["b", "c"], ["d"]]
+    assert graph.batches(["b"]) == [["a"], ["b"]]
+    assert graph.batches(["d", "e"]) == [["a", "e"], ["b", "c"], ["d"]]
+
+    with pytest.raises(Exception, match="Unknown report 'x'"):
+        graph.batches(["x"])
+
+
+def test_can_detect_cycles_in_report_graph(tmp_path):
+    root = helpers.create_temporary_root(tmp_path)
+    write_report(root, "a", "")
+    write_report(root, "b", dependency("latest(name == 'c')"))
+    write_report(root, "c", dependency("latest(name == 'b')"))
+
+    graph = orderly_report_graph(root)
+    with pytest.raises(Exception, match="form a cycle: 'b', 'c'"):
+        graph.batches()
+    assert graph.batches(["a"]) == [["a"]]
+
+
+def test_graph_of_root_without_sources_is_empty(tmp_path):
+    root = helpers.create_temporary_root(tmp_path)
+    graph = orderly_report_graph(root)
+    assert graph.reports == {}
+    assert graph.batches() == []
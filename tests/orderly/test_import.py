@@ -0,0 +1,53 @@
+import subprocess
+import sys
+
+import pytest
+
+# These are slow to import and only needed when talking to a remote
+# location, validating against a schema or reading git metadata. Loading
+# them eagerly would slow down every report, since each one runs in a
+# fresh Python process.
+LAZY_MODULES = [
+    "jsonschema",
+    "paramiko",
+    "pygit2",
+    "pyorderly.outpack.oauth",
+    "requests",
+]
+
+
+def imported_modules(statement):
+    p = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Each line has the form "import time: self | cumulative | name", where
+    # the name is indented according to its depth in the import tree.
+    result = set()
+    for line in p.stderr.splitlines():
+        if line.startswith("import time:"):
+            result.add(line.split("|")[-1].strip())
+    return result
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import pyorderly",
+        "import pyorderly.run",
+        "import pyorderly.outpack.location",
+    ],
+)
+def test_slow_dependencies_are_imported_lazily(statement):
+    modules = imported_modules(statement)
+    assert "pyorderly" in modules
+    assert modules.isdisjoint(LAZY_MODULES)
+
+
+def test_drivers_are_imported_on_demand():
+    modules = imported_modules(
+        "from pyorderly.outpack.location_ssh import OutpackLocationSSH"
+    )
+    assert "paramiko" in modules
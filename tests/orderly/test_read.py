@@ -4,7 +4,8 @@ from pathlib import Path
 
 import pytest
 
-from pyorderly.read import _read_py, orderly_read
+from pyorderly import read
+from pyorderly.read import _read_py, orderly_read, orderly_read_static
 
 
 def test_read_simple_trivial_parameters():
@@ -102,3 +103,93 @@ pyorderly.parameters(**pars)
     msg = re.escape("Passing parameters as **kwargs is not supported")
     with pytest.raises(Exception, match=msg):
         _read_py(code)
+
+
+def test_can_read_static_declarations(tmp_path):
+    path = tmp_path / "report.py"
+    path.write_text(
+        """
+import pyorderly
+pyorderly.parameters(a=1)
+pyorderly.resource("data.csv")
+pyorderly.resource(["a.txt", "b/"])
+pyorderly.shared_resource("numbers.txt")
+pyorderly.shared_resource({"w.txt": "data/weights.txt"})
+pyorderly.artefact("Summary", "summary.txt")
+pyorderly.artefact(name="Plots", files=["a.png", "b.png"])
+pyorderly.dependency(None, "latest(name == 'data')", "result.txt")
+x = pyorderly.dependency(None, "latest", {"input.txt": "result.txt"})
+"""
+    )
+    assert orderly_read_static(path) == {
+        "parameters": {"a": 1},
+        "resources": ["data.csv", "a.txt", "b/"],
+        "shared_resources": {
+            "numbers.txt": "numbers.txt",
+            "w.txt": "data/weights.txt",
+        },
+        "artefacts": [
+            {"name": "Summary", "files": ["summary.txt"]},
+            {"name": "Plots", "files": ["a.png", "b.png"]},
+        ],
+        "dependencies": [
+            {
+                "name": None,
+                "query": "latest(name == 'data')",
+                "files": {"result.txt": "result.txt"},
+            },
+            {
+                "name": None,
+                "query": "latest",
+                "files": {"input.txt": "result.txt"},
+            },
+        ],
+    }
+    assert orderly_read(path) == {"parameters": {"a": 1}}
+
+    # Modifying the result doesn't affect later reads of the same script.
+    result = orderly_read_static(path)
+    result["artefacts"][0]["files"].append("other.txt")
+    result["dependencies"][0]["files"]["x"] = "y"
+    result = orderly_read_static(path)
+    assert result["artefacts"][0]["files"] == ["summary.txt"]
+    assert result["dependencies"][0]["files"] == {"result.txt": "result.txt"}
+
+
+def test_static_declarations_skip_non_literal_arguments(tmp_path):
+    path = tmp_path / "report.py"
+    path.write_text(
+        """
+import pyorderly
+files = ["a.txt"]
+pyorderly.resource(files)
+pyorderly.resource(123)
+pyorderly.artefact("Summary")
+pyorderly.dependency(None, f"latest(name == '{name}')", "x.txt")
+pyorderly.dependency(None, "latest", {"x.txt": 1})
+"""
+    )
+    result = orderly_read_static(path)
+    assert result["resources"] == []
+    assert result["artefacts"] == []
+    assert result["dependencies"] == []
+
+
+def test_orderly_read_is_cached(tmp_path, mocker):
+    spy = mocker.spy(read, "_parse_py")
+    path = tmp_path / "report.py"
+    path.write_text("pyorderly.parameters(a=1)\n")
+
+    assert orderly_read(path) == {"parameters": {"a": 1}}
+    assert orderly_read(path) == {"parameters": {"a": 1}}
+    assert spy.call_count == 1
+
+    # Results are copies and can be modified without affecting the cache.
+    orderly_read(path)["parameters"]["a"] = 2
+    assert orderly_read(path) == {"parameters": {"a": 1}}
+    assert spy.call_count == 1
+
+    # Same size and, quite possibly, the same mtime as before.
+    path.write_text("pyorderly.parameters(a=2)\n")
+    assert orderly_read(path) == {"parameters": {"a": 2}}
+    assert spy.call_count == 2
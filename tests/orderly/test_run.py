@@ -4,12 +4,14 @@ import os
 import pytest
 from pytest_unordered import unordered
 
+from pyorderly.outpack.index import IndexData
 from pyorderly.outpack.location import outpack_location_add_path
 from pyorderly.outpack.location_pull import outpack_location_pull_metadata
 from pyorderly.outpack.metadata import PacketDepends, PacketDependsPath
 from pyorderly.outpack.search_options import SearchOptions
 from pyorderly.outpack.util import transient_working_directory
 from pyorderly.run import (
+    _prefetch_dependencies,
     _validate_parameters,
     _validate_src_directory,
     orderly_run,
@@ -289,6 +291,54 @@ def test_can_run_simple_dependency(tmp_path):
     assert meta.depends[0].files[0].there == "result.txt"
 
 
+def test_can_depend_on_a_directory(tmp_path):
+    root = helpers.create_temporary_root(tmp_path)
+    id1, _ = helpers.run_snippet(
+        "upstream",
+        """
+import os
+os.makedirs("outputs/sub")
+for p in ["outputs/a.txt", "outputs/sub/b.txt", "other.txt"]:
+    with open(p, "w") as f:
+        f.write(p)
+""",
+        root,
+    )
+    id2, files = helpers.run_snippet(
+        "downstream",
+        """
+import os
+import pyorderly
+pyorderly.dependency(None, "latest", {"inputs/": "outputs/"})
+return sorted(os.path.join(d, f) for d, _, fs in os.walk("inputs") for f in fs)
+""",
+        root,
+    )
+    assert files == [
+        os.path.join("inputs", "a.txt"),
+        os.path.join("inputs", "sub", "b.txt"),
+    ]
+    meta = root.index.metadata(id2)
+    assert meta.depends[0].packet == id1
+    assert [(f.here, f.there) for f in meta.depends[0].files] == [
+        ("inputs/a.txt", "outputs/a.txt"),
+        ("inputs/sub/b.txt", "outputs/sub/b.txt"),
+    ]
+
+
+def test_run_shares_index_with_sandbox(tmp_path):
+    root = helpers.create_temporary_root(tmp_path)
+    helpers.copy_examples(["data", "depends"], root)
+    id1 = orderly_run("data", root=root)
+
+    root.index.data = IndexData.new()
+    orderly_run("depends", root=root)
+
+    # The upstream packet's metadata was indexed by the sandbox while
+    # resolving the dependency, and handed back to us.
+    assert list(root.index.data.metadata.keys()) == [id1]
+
+
 def test_can_run_with_parameters(tmp_path):
     root = helpers.create_temporary_root(tmp_path)
     helpers.copy_examples(["parameters"], root)
@@ -536,6 +586,59 @@ def test_run_pulls_packet_only_if_require_complete_tree(tmp_path):
     assert root["dst2"].index.unpacked() == [id1, id3]
 
 
+def test_can_prefetch_dependency_files_into_store(tmp_path):
+    root = helpers.create_temporary_roots(
+        tmp_path, add_location=True, use_file_store=True
+    )
+    helpers.copy_examples(["data"], root["src"])
+    helpers.copy_examples(["depends"], root["dst"])
+    id1 = orderly_run("data", root=root["src"])
+    outpack_location_pull_metadata(root=root["dst"])
+
+    entrypoint = root["dst"].path / "src" / "depends" / "depends.py"
+    options = SearchOptions(allow_remote=True)
+
+    _prefetch_dependencies(root["dst"], entrypoint, {}, None)
+    assert root["dst"].files.ls() == []
+
+    _prefetch_dependencies(root["dst"], entrypoint, {}, options)
+    hash = root["dst"].index.metadata(id1).file_hash("result.txt")
+    assert [str(h) for h in root["dst"].files.ls()] == [hash]
+    assert root["dst"].index.unpacked() == []
+
+    id2 = orderly_run(
+        "depends", root=root["dst"], search_options=options, prefetch=True
+    )
+    assert root["dst"].index.metadata(id2).depends[0].packet == id1
+
+
+def test_prefetch_pulls_packet_if_require_complete_tree(tmp_path):
+    root = helpers.create_temporary_roots(
+        tmp_path, add_location=True, require_complete_tree=True
+    )
+    helpers.copy_examples(["data"], root["src"])
+    helpers.copy_examples(["depends"], root["dst"])
+    id1 = orderly_run("data", root=root["src"])
+
+    options = SearchOptions(allow_remote=True, pull_metadata=True)
+    id2 = orderly_run(
+        "depends", root=root["dst"], search_options=options, prefetch=True
+    )
+    assert root["dst"].index.unpacked() == [id1, id2]
+
+
+def test_prefetch_failures_are_left_to_the_report(tmp_path, capsys):
+    root = helpers.create_temporary_roots(tmp_path, add_location=True)
+    helpers.copy_examples(["depends"], root["dst"])
+    options = SearchOptions(allow_remote=True)
+
+    with helpers.report_raises("Failed to find packet for query"):
+        orderly_run(
+            "depends", root=root["dst"], search_options=options, prefetch=True
+        )
+    assert "Failed to prefetch dependencies" in capsys.readouterr().out
+
+
 def test_can_run_with_relative_path_root(tmp_path):
     root = helpers.create_temporary_root(tmp_path / "foo")
     helpers.copy_examples("data", root)
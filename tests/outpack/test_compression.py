@@ -0,0 +1,46 @@
+import pytest
+
+from pyorderly.outpack.compression import (
+    _zstd_available,
+    compress_file,
+    compression_default,
+    compression_from_suffix,
+    compression_validate,
+    decompress_file,
+)
+
+METHODS = [
+    "gzip",
+    pytest.param(
+        "zstd",
+        marks=pytest.mark.skipif(
+            not _zstd_available(), reason="zstd is not available"
+        ),
+    ),
+]
+
+
+@pytest.mark.parametrize("method", METHODS)
+def test_can_compress_and_decompress_files(tmp_path, method):
+    src = tmp_path / "src"
+    src.write_text("a,b,c\n1,2,3\n" * 1000)
+
+    compress_file(src, tmp_path / "compressed", method)
+    assert (tmp_path / "compressed").stat().st_size < src.stat().st_size
+
+    decompress_file(tmp_path / "compressed", tmp_path / "dst", method)
+    assert (tmp_path / "dst").read_bytes() == src.read_bytes()
+
+
+def test_can_validate_compression_method():
+    assert compression_validate(None) is None
+    assert compression_validate("gzip") == "gzip"
+    assert compression_validate("auto") == compression_default()
+    with pytest.raises(Exception, match="Invalid compression method 'lz4'"):
+        compression_validate("lz4")
+
+
+def test_can_detect_compression_from_suffix():
+    assert compression_from_suffix("ab/cdef.gz") == "gzip"
+    assert compression_from_suffix("ab/cdef.zst") == "zstd"
+    assert compression_from_suffix("ab/cdef") is None
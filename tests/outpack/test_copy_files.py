@@ -8,6 +8,7 @@ from pyorderly.outpack.copy_files import (
     copy_files,
 )
 from pyorderly.outpack.location_pull import outpack_location_pull_metadata
+from pyorderly.outpack.packet import Packet, insert_packet
 from pyorderly.outpack.search_options import SearchOptions
 
 from .. import helpers
@@ -36,10 +37,36 @@ def test_can_error_if_plan_impossible(tmp_path):
     id = helpers.create_random_packet(root)
     with pytest.raises(Exception, match="does not contain the requested path"):
         _plan_copy_files(root, id, {"here.txt": "other.txt"})
-    with pytest.raises(Exception, match="Directories not yet supported"):
+    with pytest.raises(Exception, match="does not contain the requested dir"):
+        _plan_copy_files(root, id, {"here/": "data/"})
+    with pytest.raises(Exception, match="can only be exported to directories"):
         _plan_copy_files(root, id, {"here.txt": "data/"})
 
 
+def test_can_plan_directory_copies(tmp_path):
+    root = helpers.create_temporary_root(tmp_path)
+    src = tmp_path / "src"
+    helpers.touch_files(
+        src / "a.txt",
+        src / "out" / "b.txt",
+        src / "out" / "sub" / "c.txt",
+        src / "outside.txt",
+    )
+    p = Packet(root, src, "data")
+    p.end()
+    insert_packet(root, src, p.metadata)
+
+    result = _plan_copy_files(root, p.id, {"here/": "out/", "x": "a.txt"})
+    assert {k: v.path for k, v in result.files.items()} == {
+        "here/b.txt": "out/b.txt",
+        "here/sub/c.txt": "out/sub/c.txt",
+        "x": "a.txt",
+    }
+
+    result = _plan_copy_files(root, p.id, "out/sub/")
+    assert list(result.files.keys()) == ["out/sub/c.txt"]
+
+
 @pytest.mark.parametrize("use_file_store", [True, False])
 def test_can_copy_files_from_remote(tmp_path, use_file_store):
     root = helpers.create_temporary_roots(
@@ -1,6 +1,12 @@
+import concurrent.futures
+import gc
 import os
+import pickle
 import platform
 import random
+import threading
+import time
+import weakref
 
 import pytest
 
@@ -126,3 +132,340 @@ def test_can_create_filename_within_the_store(tmp_path):
         assert os.path.dirname(temp_file) == str(store._path / "tmp")
         assert os.path.exists(temp_file)
         assert os.path.exists(os.path.dirname(temp_file))
+
+
+def test_put_validates_hash_unless_asked_not_to(tmp_path):
+    path = tmp_path / "a"
+    path.write_text(randstr(10))
+    store = FileStore(str(tmp_path / "store"))
+    h = hash_file(path, "md5")
+    wrong = Hash("md5", "7c4d97e580abb6c2ffb8b1872907d84b")
+
+    with pytest.raises(Exception, match=r"Hash of '.+' does not match"):
+        store.put(path, wrong)
+    assert not store.exists(wrong)
+
+    assert store.put(path, h, verify=False) == h
+    assert store.exists(h)
+    assert hash_file(store.filename(h), "md5") == h
+
+
+def test_can_put_many_files(tmp_path):
+    tmp = tmp_path / "tmp"
+    tmp.mkdir()
+    files = []
+    for i in range(10):
+        p = tmp / f"file{i}"
+        # Include some duplicated contents, which must only be stored once.
+        p.write_text(str(i % 7))
+        files.append((p, hash_file(p, "md5")))
+
+    store = FileStore(str(tmp_path / "store"))
+    result = store.put_many(files, workers=4)
+    assert result == [h for _, h in files]
+    assert len(store.ls()) == 7
+    assert all(store.exists(h) for _, h in files)
+
+
+def test_can_remove_files_from_store(tmp_path):
+    s = FileStore(str(tmp_path / "store"))
+    p = tmp_path / "a"
+    p.write_text("a")
+    h = s.put(p, hash_file(p, "md5"))
+
+    with s.tmp() as tmp:
+        assert s.ls() == [h]
+        assert os.path.exists(tmp)
+
+    s.remove(h)
+    assert not s.exists(h)
+    assert s.ls() == []
+
+
+def test_can_iterate_over_store(tmp_path):
+    s = FileStore(str(tmp_path / "store"))
+    hashes = {}
+    for i in range(5):
+        p = tmp_path / f"f{i}"
+        p.write_text("x" * i)
+        hashes[str(s.put(p, hash_file(p, "md5")))] = i
+
+    seen = {}
+    for h, entry in s.scan():
+        seen[str(h)] = entry.stat().st_size
+    assert seen == hashes
+    assert sorted(str(h) for h in s.ls()) == sorted(hashes)
+
+
+def test_can_summarise_store(tmp_path):
+    s = FileStore(str(tmp_path / "store"))
+    assert s.summary().count == 0
+
+    hashes = []
+    for i in range(5):
+        p = tmp_path / f"f{i}"
+        p.write_text("x" * i)
+        hashes.append(s.put(p, hash_file(p, "md5")))
+
+    summary = s.summary()
+    assert summary.count == 5
+    assert summary.size == 10
+    assert sum(summary.prefixes.values()) == 5
+    for h in hashes:
+        assert summary.prefixes[h.value[:2]] >= 1
+
+
+def test_can_store_compressed_files(tmp_path):
+    s = FileStore(str(tmp_path / "store"), compression="gzip")
+    src = tmp_path / "src"
+    src.write_text("a,b,c\n1,2,3\n" * 1000)
+    h = hash_file(src, "md5")
+
+    s.put(src, h)
+    path = s.find(h)
+    assert path == s.filename(h).with_name(s.filename(h).name + ".gz")
+    assert path.stat().st_size < src.stat().st_size
+    assert s.exists(h)
+    assert s.ls() == [h]
+
+    s.get(h, tmp_path / "dst")
+    assert (tmp_path / "dst").read_bytes() == src.read_bytes()
+
+    with s.uncompressed(h) as p:
+        assert hash_file(p, "md5") == h
+
+    s.remove(h)
+    assert not s.exists(h)
+
+
+def test_stores_incompressible_files_uncompressed(tmp_path):
+    s = FileStore(str(tmp_path / "store"), compression="gzip")
+    src = tmp_path / "src"
+    src.write_bytes(os.urandom(100))
+    h = hash_file(src, "md5")
+
+    s.put(src, h, move=True)
+    assert s.find(h) == s.filename(h)
+    assert not src.exists()
+    with s.uncompressed(h) as p:
+        assert p == s.filename(h)
+
+
+def test_only_looks_for_compressed_files_where_there_may_be_some(
+    tmp_path, mocker
+):
+    s = FileStore(str(tmp_path / "store"))
+    h = Hash("md5", "7c4d97e580abb6c2ffb8b1872907d84b")
+    exists = mocker.spy(os.path, "exists")
+    assert s.find(h) is None
+    assert exists.call_count == 1
+
+    # Another process, configured to compress files, stores one.
+    src = tmp_path / "src"
+    src.write_text("a,b,c\n1,2,3\n" * 1000)
+    h = hash_file(src, "md5")
+    FileStore(str(tmp_path / "store"), compression="gzip").put(src, h)
+
+    s.get(h, tmp_path / "dst")
+    assert (tmp_path / "dst").read_bytes() == src.read_bytes()
+    assert s.exists(h)
+    assert FileStore(str(tmp_path / "store")).exists(h)
+
+
+def create_files(path, store, n, size=10):
+    path.mkdir(parents=True, exist_ok=True)
+    hashes = []
+    for i in range(n):
+        p = path / f"f{i}"
+        p.write_bytes(os.urandom(size))
+        hashes.append(store.put(p, hash_file(p, "md5")))
+    return hashes
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_can_move_small_files_into_packs(tmp_path, compression):
+    s = FileStore(str(tmp_path / "store"), compression=compression)
+    small = create_files(tmp_path / "small", s, 10)
+    large = create_files(tmp_path / "large", s, 2, size=1000)
+    if compression is not None:
+        p = tmp_path / "compressible"
+        p.write_text("x" * 1000)
+        small.append(s.put(p, hash_file(p, "md5")))
+
+    assert s.repack(max_size=500) == len(small)
+
+    assert all(s.find(h) is None for h in small)
+    assert all(s.find(h) is not None for h in large)
+    assert sorted(str(h) for h in s.ls()) == sorted(
+        str(h) for h in small + large
+    )
+    for h in small + large:
+        assert s.exists(h)
+        s.get(h, tmp_path / "dest" / h.value)
+        assert hash_file(tmp_path / "dest" / h.value, "md5") == h
+
+    # A fresh store object finds the same packs.
+    s2 = FileStore(str(tmp_path / "store"))
+    assert all(s2.exists(h) for h in small)
+    assert s2.summary().count == len(small) + len(large)
+
+
+def test_can_combine_packs(tmp_path):
+    s = FileStore(str(tmp_path / "store"))
+    first = create_files(tmp_path / "first", s, 3)
+    s.repack()
+    second = create_files(tmp_path / "second", s, 3)
+    s.repack()
+
+    assert len(list(s.pack_path.glob("*.idx"))) == 1
+    assert all(s.exists(h) for h in first + second)
+
+
+def test_can_remove_files_from_packs(tmp_path):
+    s = FileStore(str(tmp_path / "store"))
+    hashes = create_files(tmp_path / "src", s, 5)
+    s.repack()
+
+    s.remove_many(hashes[:2])
+    assert [s.exists(h) for h in hashes] == [False] * 2 + [True] * 3
+    assert len(s.ls()) == 3
+
+    with pytest.raises(FileNotFoundError, match="not found in store"):
+        s.remove(hashes[0])
+
+
+def test_does_not_store_packed_files_again(tmp_path):
+    s = FileStore(str(tmp_path / "store"))
+    (h,) = create_files(tmp_path / "src", s, 1)
+    s.repack()
+    s.put(tmp_path / "src" / "f0", h)
+    assert s.find(h) is None
+    with s.uncompressed(h) as p:
+        assert hash_file(p, "md5") == h
+
+
+def test_records_reuse_of_packed_files(tmp_path):
+    s = FileStore(str(tmp_path / "store"))
+    (h,) = create_files(tmp_path / "src", s, 1)
+    s.repack()
+    t = time.time() - 1
+    assert str(h) not in s.recently_used(t)
+    s.put(tmp_path / "src" / "f0", h)
+    assert str(h) in s.recently_used(t)
+    assert [str(x) for x in s.ls()] == [str(h)]
+
+
+def test_releases_replaced_packs(tmp_path):
+    s = FileStore(str(tmp_path / "store"))
+    s2 = FileStore(str(tmp_path / "store"))
+    first = create_files(tmp_path / "first", s, 3)
+    s.repack()
+    assert all(s2.exists(h) for h in first)
+    old = weakref.ref(s2._packs()[0])
+
+    second = create_files(tmp_path / "second", s, 3)
+    s.repack()
+    # The other store doesn't notice the new pack until it looks for a
+    # file that it can't otherwise find.
+    dest = tmp_path / "dest"
+    s2.get(second[0], dest)
+    assert hash_file(dest, "md5") == second[0]
+    gc.collect()
+    assert old() is None
+
+
+def test_can_read_packs_while_other_threads_replace_them(tmp_path):
+    s = FileStore(str(tmp_path / "store"))
+    hashes = create_files(tmp_path / "src", s, 10)
+    s.repack()
+    stop = threading.Event()
+
+    def read(i):
+        n = 0
+        while not stop.is_set() or n == 0:
+            h = hashes[i % len(hashes)]
+            assert s.exists(h)
+            s.get(h, tmp_path / "dest" / str(i), overwrite=True)
+            n += 1
+        return n
+
+    with concurrent.futures.ThreadPoolExecutor(4) as pool:
+        readers = [pool.submit(read, i) for i in range(4)]
+        for i in range(20):
+            create_files(tmp_path / f"more{i}", s, 1)
+            s.repack()
+            # Other threads reload the packs when they next look for one.
+            s._packs(reload=True)
+        stop.set()
+        assert all(r.result() > 0 for r in readers)
+
+
+def test_can_read_from_replaced_pack(tmp_path):
+    s = FileStore(str(tmp_path / "store"))
+    s2 = FileStore(str(tmp_path / "store"))
+    hashes = create_files(tmp_path / "src", s, 3)
+    s.repack()
+    ((pack, entry),) = [s2._find_packed(hashes[0])]
+
+    create_files(tmp_path / "more", s, 3)
+    s.repack()
+    assert not pack.path.exists()
+    assert pack.read(entry) == (tmp_path / "src" / "f0").read_bytes()
+
+
+def test_can_pickle_store_with_packs(tmp_path):
+    s = FileStore(str(tmp_path / "store"))
+    (h,) = create_files(tmp_path / "src", s, 1)
+    s.repack()
+    assert s.exists(h)
+    assert pickle.loads(pickle.dumps(s)).exists(h)  # noqa: S301
+
+
+def test_can_check_many_hashes_at_once(tmp_path, mocker):
+    s = FileStore(str(tmp_path / "store"))
+    hashes = create_files(tmp_path / "src", s, 3)
+    missing = Hash("md5", "0" * 32)
+    query = [*hashes, missing]
+    expected = [True, True, True, False]
+
+    assert s.exists_many(query) == expected
+
+    s.load_contents()
+    spy = mocker.spy(s, "exists")
+    assert s.exists_many(query) == expected
+    (new,) = create_files(tmp_path / "new", s, 1)
+    assert s.exists_many([new]) == [True]
+    s.remove(hashes[0])
+    assert s.exists_many(query) == [False, True, True, False]
+    assert spy.call_count == 0
+
+
+def test_can_use_bloom_filter(tmp_path, mocker):
+    s = FileStore(str(tmp_path / "store"))
+    hashes = create_files(tmp_path / "src", s, 10)
+    s.build_bloom_filter()
+    assert s.bloom_path.exists()
+
+    # A separate object, as another process would have, uses the filter
+    # and sees files added after it was built.
+    other = FileStore(str(tmp_path / "store"))
+    (new,) = create_files(tmp_path / "new", s, 1)
+    missing = [Hash("md5", f"{i:032x}") for i in range(100)]
+
+    spy = mocker.spy(other, "exists")
+    assert other.exists_many([*hashes, new], approximate=True) == [True] * 11
+    assert other.exists_many(missing, approximate=True) == [False] * 100
+    # Only hashes the filter couldn't rule out were looked up on disk.
+    assert spy.call_count < 11 + 10
+
+
+def test_bloom_filter_is_only_used_for_approximate_checks(tmp_path):
+    # Opened before the filter is built, so files it adds aren't recorded.
+    before = FileStore(str(tmp_path / "store"))
+    s = FileStore(str(tmp_path / "store"))
+    s.build_bloom_filter()
+    hashes = create_files(tmp_path / "src", before, 20)
+
+    after = FileStore(str(tmp_path / "store"))
+    assert after.exists_many(hashes) == [True] * 20
+    assert not all(after.exists_many(hashes, approximate=True))
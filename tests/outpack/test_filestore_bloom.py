@@ -0,0 +1,32 @@
+import pytest
+
+from pyorderly.outpack.filestore_bloom import BloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives(tmp_path):
+    bloom = BloomFilter.create(tmp_path / "bloom", 1000)
+    values = [f"sha256:{i:064x}" for i in range(1000)]
+    for v in values:
+        bloom.add(v)
+    assert all(v in bloom for v in values)
+
+
+def test_bloom_filter_has_few_false_positives(tmp_path):
+    bloom = BloomFilter.create(tmp_path / "bloom", 1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"sha256:{i:064x}")
+    others = [f"md5:{i:032x}" for i in range(10000)]
+    assert sum(v in bloom for v in others) < 300
+
+
+def test_bloom_filter_is_persisted(tmp_path):
+    bloom = BloomFilter.create(tmp_path / "bloom", 10)
+    bloom.add("a")
+    bloom.close()
+    assert "a" in BloomFilter(tmp_path / "bloom")
+
+
+def test_rejects_invalid_bloom_filter(tmp_path):
+    (tmp_path / "bloom").write_bytes(b"x" * 100)
+    with pytest.raises(Exception, match="is not a Bloom filter"):
+        BloomFilter(tmp_path / "bloom")
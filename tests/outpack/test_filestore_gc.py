@@ -0,0 +1,227 @@
+import os
+import time
+
+import pytest
+
+from pyorderly.outpack.filestore_gc import outpack_cache_evict, outpack_gc
+from pyorderly.outpack.hash import hash_file
+from pyorderly.outpack.location_pull import (
+    outpack_location_pull_metadata,
+    outpack_location_pull_packet,
+)
+
+from .. import helpers
+
+
+def add_unused_file(root, contents):
+    p = root.path / "unused"
+    p.write_text(contents)
+    return root.files.put(p, hash_file(p, "sha256"), move=True)
+
+
+def test_can_remove_unused_files(tmp_path, capsys):
+    root = helpers.create_temporary_root(tmp_path, use_file_store=True)
+    id = helpers.create_random_packet(root)
+    used = root.index.metadata(id).files[0].hash
+    unused = add_unused_file(root, "hello")
+
+    res = outpack_gc(root, grace_period=0)
+
+    assert res.hashes == [unused]
+    assert res.size == 5
+    assert not root.files.exists(unused)
+    assert root.files.exists(used)
+    assert capsys.readouterr().out == "Removed 1 unused file (5 Bytes)\n"
+
+
+def test_can_do_a_dry_run(tmp_path, capsys):
+    root = helpers.create_temporary_root(tmp_path, use_file_store=True)
+    unused = add_unused_file(root, "hello")
+
+    res = outpack_gc(root, grace_period=0, dry_run=True)
+
+    assert res.hashes == [unused]
+    assert res.size == 5
+    assert res.dry_run
+    assert root.files.exists(unused)
+    assert capsys.readouterr().out == "Would remove 1 unused file (5 Bytes)\n"
+
+
+def test_keeps_recent_files(tmp_path):
+    root = helpers.create_temporary_root(tmp_path, use_file_store=True)
+    unused = add_unused_file(root, "hello")
+
+    res = outpack_gc(root)
+
+    assert res.hashes == []
+    assert root.files.exists(unused)
+
+
+@pytest.mark.parametrize("use_file_store", [True, False])
+def test_can_remove_leftover_temporary_files(tmp_path, use_file_store):
+    root = helpers.create_temporary_root(
+        tmp_path, use_file_store=use_file_store, require_complete_tree=True
+    )
+    helpers.create_random_packet(root)
+
+    leftovers = [root.path / "orderly" / "pull" / "tmp" / "abc"]
+    if use_file_store:
+        leftovers.append(root.files.tmp_path / "def")
+    helpers.touch_files(*leftovers)
+
+    res = outpack_gc(root, grace_period=0)
+
+    assert res.hashes == []
+    assert sorted(res.temporary_files) == sorted(leftovers)
+    assert not any(os.path.exists(p) for p in leftovers)
+
+
+def create_cached_packets(tmp_path, n):
+    root = helpers.create_temporary_roots(
+        tmp_path,
+        add_location=True,
+        use_file_store=True,
+        path_archive=None,
+    )
+    ids = [helpers.create_random_packet(root["src"]) for _ in range(n)]
+    outpack_location_pull_metadata(root=root["dst"])
+    outpack_location_pull_packet(ids, root=root["dst"])
+    return root, ids
+
+
+def set_access_time(root, id, t):
+    for f in root.index.metadata(id).files:
+        path = root.files.filename(f.hash)
+        os.utime(path, (t, path.stat().st_mtime))
+
+
+def test_can_evict_least_recently_used_files(tmp_path):
+    root, ids = create_cached_packets(tmp_path, 3)
+    for i, id in enumerate(ids):
+        set_access_time(root["dst"], id, 1000 - i)
+    size = root["dst"].files.summary().size
+
+    res = outpack_cache_evict(root["dst"], max_size=size - 1, grace_period=0)
+
+    assert res.packets == [ids[2]]
+    assert [str(h) for h in res.hashes] == [
+        f.hash for f in root["src"].index.metadata(ids[2]).files
+    ]
+    assert root["dst"].index.unpacked() == ids[:2]
+    assert ids[2] in root["dst"].index.packets_in_location("src")
+
+    # The packet can be pulled back in from its location.
+    outpack_location_pull_packet(ids[2], root=root["dst"])
+    assert root["dst"].index.unpacked() == ids
+
+
+def test_never_evicts_local_only_packets(tmp_path):
+    root, ids = create_cached_packets(tmp_path, 2)
+    id = helpers.create_random_packet(root["dst"])
+
+    res = outpack_cache_evict(root["dst"], max_size=0, grace_period=0)
+
+    assert res.packets == sorted(ids)
+    assert root["dst"].index.unpacked() == [id]
+    assert root["dst"].files.summary().count == 1
+
+
+def test_can_evict_in_dry_run(tmp_path):
+    root, ids = create_cached_packets(tmp_path, 2)
+
+    res = outpack_cache_evict(
+        root["dst"], max_size=0, grace_period=0, dry_run=True
+    )
+
+    assert res.packets == sorted(ids)
+    assert len(res.hashes) == 2
+    assert root["dst"].index.unpacked() == sorted(ids)
+    assert root["dst"].files.summary().count == 2
+
+
+def test_never_evicts_recent_files(tmp_path):
+    root, ids = create_cached_packets(tmp_path, 2)
+
+    res = outpack_cache_evict(root["dst"], max_size=0)
+    assert res.hashes == []
+    assert root["dst"].index.unpacked() == sorted(ids)
+
+
+def test_never_evicts_files_added_again_recently(tmp_path):
+    root, ids = create_cached_packets(tmp_path, 2)
+    f = root["dst"].index.metadata(ids[0]).files[0]
+    p = tmp_path / "again"
+    p.write_text(root["dst"].files.filename(f.hash).read_text())
+    root["dst"].files.repack()
+    root["dst"].files.put(p, f.hash, move=True)
+
+    # As though the file had been added again within the grace period.
+    marker = root["dst"].files.used_path / f.hash.replace(":", "-")
+    t = time.time() + 60
+    os.utime(marker, (t, t))
+
+    res = outpack_cache_evict(root["dst"], max_size=0, grace_period=0)
+    assert res.packets == [ids[1]]
+    assert root["dst"].index.unpacked() == [ids[0]]
+    assert root["dst"].files.exists(f.hash)
+
+
+def test_evicting_requires_file_store(tmp_path):
+    root = helpers.create_temporary_root(tmp_path)
+    with pytest.raises(Exception, match="requires a root with a file store"):
+        outpack_cache_evict(root, max_size=0)
+
+
+def test_can_remove_unused_files_from_packs(tmp_path):
+    root = helpers.create_temporary_root(tmp_path, use_file_store=True)
+    id = helpers.create_random_packet(root)
+    used = root.index.metadata(id).files[0].hash
+    unused = add_unused_file(root, "hello")
+    root.files.repack()
+
+    res = outpack_gc(root, grace_period=0)
+
+    assert res.hashes == [unused]
+    assert not root.files.exists(unused)
+    assert root.files.exists(used)
+
+
+def test_keeps_files_added_again_by_other_users(tmp_path, mocker):
+    root = helpers.create_temporary_root(tmp_path, use_file_store=True)
+    unused = add_unused_file(root, "hello")
+
+    # We can't change the timestamps of files owned by other users.
+    mocker.patch("os.utime", side_effect=PermissionError)
+    add_unused_file(root, "hello")
+    mocker.stopall()
+
+    assert str(unused) in root.files.recently_used(time.time() - 60)
+    marker = root.files.used_path / f"sha256-{unused.value}"
+    t = time.time() + 60
+    os.utime(marker, (t, t))
+
+    res = outpack_gc(root, grace_period=0)
+    assert res.hashes == []
+    assert root.files.exists(unused)
+
+    t = time.time() - 60
+    os.utime(marker, (t, t))
+    res = outpack_gc(root, grace_period=0)
+    assert res.hashes == [unused]
+    assert not marker.exists()
+
+
+def test_keeps_packed_files_added_again(tmp_path):
+    root = helpers.create_temporary_root(tmp_path, use_file_store=True)
+    unused = add_unused_file(root, "hello")
+    root.files.repack()
+    add_unused_file(root, "hello")
+
+    # As though the file had been added again within the grace period.
+    marker = root.files.used_path / f"sha256-{unused.value}"
+    t = time.time() + 60
+    os.utime(marker, (t, t))
+
+    res = outpack_gc(root, grace_period=0)
+    assert res.hashes == []
+    assert root.files.exists(unused)
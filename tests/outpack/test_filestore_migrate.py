@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+from pyorderly.outpack.filestore_migrate import outpack_migrate_to_file_store
+from pyorderly.outpack.root import root_open
+
+from .. import helpers
+
+
+def create_archive_root(tmp_path, n=2):
+    root = helpers.create_temporary_root(
+        tmp_path, use_file_store=False, path_archive="archive"
+    )
+    ids = [helpers.create_random_packet(root) for _ in range(n)]
+    return root, ids
+
+
+@pytest.mark.parametrize("link", [True, False])
+def test_can_migrate_archive_to_file_store(tmp_path, capsys, link):
+    root, ids = create_archive_root(tmp_path)
+
+    res = outpack_migrate_to_file_store(root, link=link)
+
+    assert res.files == 2
+    assert res.missing == []
+    assert res.corrupt == []
+    assert capsys.readouterr().out.startswith("Added 2 files (")
+
+    root = root_open(root.path, locate=False)
+    assert root.config.core.use_file_store
+    assert root.config.core.path_archive == "archive"
+    for id in ids:
+        meta = root.index.metadata(id)
+        f = meta.files[0]
+        assert root.files.exists(f.hash)
+        archived = root.path / "archive" / meta.name / id / f.path
+        stored = root.files.find(f.hash)
+        assert os.path.samefile(archived, stored) == link
+
+    dest = tmp_path / "dest"
+    root.export_files({"data.txt": root.index.metadata(ids[0]).files[0]}, dest)
+    assert (dest / "data.txt").exists()
+
+
+def test_cant_migrate_root_without_archive(tmp_path):
+    root = helpers.create_temporary_root(
+        tmp_path, use_file_store=True, path_archive=None
+    )
+    with pytest.raises(Exception, match="has no archive to migrate"):
+        outpack_migrate_to_file_store(root)
+
+
+def test_can_use_packets_inserted_by_roots_opened_before_migration(tmp_path):
+    root, _ = create_archive_root(tmp_path, n=1)
+    # Opened before the migration, so still only uses the archive.
+    before = root_open(root.path, locate=False)
+
+    outpack_migrate_to_file_store(root)
+    id = helpers.create_random_packet(before)
+
+    root = root_open(root.path, locate=False)
+    f = root.index.metadata(id).files[0]
+    assert not root.files.exists(f.hash)
+    assert root.export_files({"a.txt": f}, tmp_path / "dest") == {}
+    assert root.export_file(id, "data.txt", "b.txt", tmp_path / "dest")
+    assert (tmp_path / "dest" / "a.txt").exists()
+    assert (tmp_path / "dest" / "b.txt").exists()
+
+    # Migrating again moves the packet into the store.
+    res = outpack_migrate_to_file_store(root)
+    assert res.files == 1
+    assert root.files.exists(f.hash)
+
+
+def test_migration_stops_on_corrupt_files(tmp_path):
+    root, ids = create_archive_root(tmp_path)
+    meta = root.index.metadata(ids[0])
+    path = root.path / "archive" / meta.name / ids[0] / "data.txt"
+    path.chmod(0o644)
+    path.write_text("corrupted")
+
+    with pytest.raises(Exception, match=f"{ids[0]}/data.txt \\(corrupt\\)"):
+        outpack_migrate_to_file_store(root)
+    assert not root_open(root.path, locate=False).config.core.use_file_store
+
+    path.unlink()
+    with pytest.raises(Exception, match=f"{ids[0]}/data.txt \\(missing\\)"):
+        outpack_migrate_to_file_store(root)
@@ -0,0 +1,70 @@
+import pytest
+
+from pyorderly.outpack.filestore_stats import outpack_storage_report
+from pyorderly.outpack.hash import hash_string
+
+from .. import helpers
+
+
+def create_packet_with_files(root, name, files):
+    with helpers.create_packet(root, name) as p:
+        for path, contents in files.items():
+            helpers.write_file(p.path / path, contents)
+    return p.id
+
+
+def sha256(x):
+    return str(hash_string(x, "sha256"))
+
+
+@pytest.mark.parametrize("use_file_store", [True, False])
+def test_can_report_storage_use(tmp_path, use_file_store):
+    root = helpers.create_temporary_root(
+        tmp_path, use_file_store=use_file_store, path_archive="archive"
+    )
+    create_packet_with_files(root, "a", {"x": "shared", "y": "aaaa"})
+    create_packet_with_files(root, "a", {"x": "shared", "y": "aa"})
+    create_packet_with_files(root, "b", {"x": "shared", "z": "shared"})
+
+    res = outpack_storage_report(root, largest=2)
+
+    assert res.packets == 3
+    assert res.files == 6
+    assert res.size == 6 + 4 + 6 + 2 + 6 + 6
+    assert res.unique_size == 6 + 4 + 2
+    assert res.saved_size == 18
+    assert res.duplicate_ratio == 30 / 12
+
+    a = res.names["a"]
+    assert a.packets == 2
+    assert a.size == 18
+    assert a.unique_size == 6
+    assert a.shared_size == 6
+    assert a.duplicate_ratio == 1.5
+
+    b = res.names["b"]
+    assert b.packets == 1
+    assert b.size == 12
+    assert b.unique_size == 0
+    assert b.shared_size == 6
+
+    assert [x.hash for x in res.largest] == [sha256("shared"), sha256("aaaa")]
+    assert res.largest[0].size == 6
+    assert res.largest[0].packets == 3
+    assert res.largest[0].names == ["a", "b"]
+    assert res.largest[1].names == ["a"]
+
+    if use_file_store:
+        assert res.stored_size == 12
+    else:
+        assert res.stored_size is None
+
+
+def test_report_on_empty_root(tmp_path):
+    root = helpers.create_temporary_root(tmp_path)
+    res = outpack_storage_report(root)
+    assert res.packets == 0
+    assert res.size == 0
+    assert res.duplicate_ratio == 1.0
+    assert res.names == {}
+    assert res.largest == []
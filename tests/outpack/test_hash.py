@@ -3,6 +3,7 @@ import pytest
 from pyorderly.outpack.hash import (
     Hash,
     hash_file,
+    hash_files,
     hash_parse,
     hash_string,
     hash_validate_file,
@@ -56,3 +57,15 @@ def test_hash_validate_string_is_silent_on_success():
     assert e.match("Hash of my data does not match:")
     assert e.match("my additional\n")
     assert e.match("lines of text")
+
+
+def test_hash_files_preserves_order(tmp_path):
+    paths = []
+    for i in range(20):
+        p = tmp_path / f"file{i}"
+        p.write_text(f"contents {i}")
+        paths.append(p)
+    expected = [hash_file(p, "md5") for p in paths]
+    assert hash_files(paths, "md5") == expected
+    assert hash_files(paths, "md5", workers=1) == expected
+    assert hash_files(paths, "md5", workers=3) == expected
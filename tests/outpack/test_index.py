@@ -39,3 +39,15 @@ def test_rebuild_can_pick_up_deletions(tmp_path):
     assert idx1.metadata(packet).id == packet
     with pytest.raises(KeyError):
         idx2.metadata(packet)
+
+
+def test_index_ignores_files_being_written(tmp_path):
+    shutil.copytree("example", tmp_path, dirs_exist_ok=True)
+    packet = "20230807-152344-ee606dce"
+    for d in ["metadata", "location/local"]:
+        path = tmp_path / ".outpack" / d
+        shutil.copy(path / packet, path / f".{packet}.abcdef")
+        (path / ".other.abcdef").write_text("{")
+    idx = Index(tmp_path)
+    assert len(idx.all_metadata()) == 5
+    assert len(idx.location("local")) == 5
@@ -55,3 +55,20 @@ def test_require_same_options_if_reinitialising(tmp_path):
     assert "* 'path_archive' was archive but None requested" in str(e)
     assert "* 'require_complete_tree' was False but True requested" in str(e)
     assert "* 'use_file_store' was False but True requested" in str(e)
+
+
+def test_can_create_repo_with_compressed_file_store(tmp_path):
+    path = outpack_init(
+        tmp_path, use_file_store=True, file_store_compression="gzip"
+    )
+    assert read_config(path).file_store_compression == "gzip"
+
+    with pytest.raises(Exception, match="requires 'use_file_store'"):
+        outpack_init(tmp_path / "other", file_store_compression="gzip")
+
+
+def test_compression_is_omitted_from_config_by_default(tmp_path):
+    path = outpack_init(tmp_path)
+    config = (path / ".outpack" / "config.json").read_text()
+    assert "compression" not in config
+    assert read_config(path).file_store_compression is None
@@ -1,5 +1,6 @@
 import pytest
 
+from pyorderly.outpack.config import read_config
 from pyorderly.outpack.location import (
     _find_all_dependencies,
     location_resolve_valid,
@@ -9,6 +10,7 @@ from pyorderly.outpack.location import (
     outpack_location_remove,
     outpack_location_rename,
 )
+from pyorderly.outpack.root import root_open
 
 from ..helpers import (
     create_metadata_depends,
@@ -35,6 +37,21 @@ def test_can_add_location(tmp_path):
     assert set(locations) == {"local", "b", "c"}
 
 
+def test_location_changes_from_two_roots_are_not_lost(tmp_path):
+    root = create_temporary_roots(tmp_path, ["a", "b", "c"])
+    a1 = root_open(root["a"].path)
+    a2 = root_open(root["a"].path)
+
+    outpack_location_add_path("b", root["b"], root=a1)
+    outpack_location_add_path("c", root["c"], root=a2)
+
+    assert set(outpack_location_list(a2)) == {"local", "b", "c"}
+    assert set(read_config(root["a"].path).location) == {"local", "b", "c"}
+
+    with pytest.raises(Exception, match="already exists"):
+        outpack_location_rename("c", "b", root=a1)
+
+
 def test_cant_add_location_with_reserved_name(tmp_path):
     root = create_temporary_root(tmp_path)
     upstream = create_temporary_root(tmp_path)
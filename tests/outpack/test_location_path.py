@@ -113,6 +113,20 @@ def test_can_locate_files_from_store(tmp_path, use_file_store):
     assert str(hash_file(dest)) == files[0].hash
 
 
+def test_can_locate_compressed_files_from_store(tmp_path):
+    root = create_temporary_root(
+        tmp_path, use_file_store=True, file_store_compression="gzip"
+    )
+    id = create_random_packet(tmp_path)
+    packet = root.index.metadata(id)
+    f = packet.files[0]
+    assert root.files.find(f.hash).suffix == ".gz"
+
+    dest = tmp_path / "dest"
+    OutpackLocationPath(root.path).fetch_file(packet, f, dest)
+    assert str(hash_file(dest)) == f.hash
+
+
 @pytest.mark.parametrize("use_file_store", [True, False])
 def test_sensible_error_if_file_not_found_in_store(tmp_path, use_file_store):
     root = create_temporary_root(tmp_path, use_file_store=use_file_store)
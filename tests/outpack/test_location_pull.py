@@ -4,9 +4,11 @@ import json
 import os
 import re
 from operator import itemgetter
+from pathlib import Path
 
 import pytest
 
+from pyorderly.outpack import util
 from pyorderly.outpack.hash import hash_file
 from pyorderly.outpack.ids import outpack_id
 from pyorderly.outpack.location import (
@@ -589,3 +591,31 @@ def test_skip_files_already_on_disk(tmp_path):
     assert re.search(
         r"Need to fetch 1 file \([0-9]* Bytes\) from 1 location", text
     )
+
+
+@pytest.mark.parametrize("path_archive", [None, "archive"])
+def test_pull_flushes_files_before_marking_packets_known(
+    tmp_path, mocker, path_archive
+):
+    root = create_temporary_roots(
+        tmp_path,
+        add_location=True,
+        use_file_store=True,
+        path_archive=path_archive,
+    )
+    ids = [create_random_packet(root["src"]) for _ in range(5)]
+    outpack_location_pull_metadata(root=root["dst"])
+
+    spy = mocker.spy(util, "_fsync_directory")
+    outpack_location_pull_packet(ids, root=root["dst"])
+
+    flushed = [Path(c.args[0]) for c in spy.call_args_list]
+    local = root["dst"].path / ".outpack" / "location" / "local"
+    assert flushed[-1] == local
+    assert flushed.count(local) == 1
+    files = root["dst"].path / ".outpack" / "files"
+    assert any(files in p.parents for p in flushed[:-1])
+    if path_archive:
+        archive = root["dst"].path / path_archive
+        assert any(archive in p.parents for p in flushed[:-1])
+    assert root["dst"].index.unpacked() == sorted(ids)
@@ -162,6 +162,20 @@ def test_can_fetch_files(tmp_path, use_file_store):
         assert str(hash_file(dest)) == files[0].hash
 
 
+def test_can_fetch_compressed_files(tmp_path):
+    root = create_temporary_root(
+        tmp_path, use_file_store=True, file_store_compression="gzip"
+    )
+    id = create_random_packet(tmp_path)
+    files = root.index.metadata(id).files
+    assert root.files.find(files[0].hash).suffix == ".gz"
+
+    with start_ssh_location(tmp_path) as location:
+        dest = tmp_path / "data"
+        location.fetch_file(root.index.metadata(id), files[0], dest)
+        assert str(hash_file(dest)) == files[0].hash
+
+
 @pytest.mark.parametrize("use_file_store", [True, False])
 def test_errors_if_file_not_found(tmp_path, use_file_store):
     root = create_temporary_root(tmp_path, use_file_store=use_file_store)
@@ -284,3 +298,15 @@ def test_can_use_abolute_path(tmp_path):
 
     with start_ssh_location(tmp_path, path="bar") as location:
         assert location.list_packets().keys() == {ids["bar"]}
+
+
+def test_errors_clearly_if_file_is_in_a_pack(tmp_path):
+    root = create_temporary_root(tmp_path, use_file_store=True)
+    id = create_random_packet(tmp_path)
+    root.files.repack()
+    files = root.index.metadata(id).files
+
+    with start_ssh_location(tmp_path) as location:
+        dest = tmp_path / "data"
+        with pytest.raises(Exception, match="can't be read over ssh"):
+            location.fetch_file(root.index.metadata(id), files[0], dest)
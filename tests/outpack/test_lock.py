@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from pyorderly.outpack.lock import file_lock, root_lock
+
+
+def test_exclusive_lock_excludes_others(tmp_path):
+    path = tmp_path / "lock"
+    with file_lock(path):
+        with pytest.raises(Exception, match="Timed out waiting for lock"):
+            with file_lock(path, timeout=0.1):
+                pass
+        with pytest.raises(Exception, match="Timed out waiting for lock"):
+            with file_lock(path, shared=True, timeout=0.1):
+                pass
+    with file_lock(path, timeout=0.1):
+        pass
+
+
+def test_shared_locks_can_be_held_together(tmp_path):
+    path = tmp_path / "lock"
+    with file_lock(path, shared=True):
+        with file_lock(path, shared=True, timeout=0.1):
+            pass
+        with pytest.raises(Exception, match="Timed out waiting for lock"):
+            with file_lock(path, timeout=0.1):
+                pass
+
+
+def test_lock_waits_for_holder(tmp_path):
+    path = tmp_path / "lock"
+    acquired = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def hold():
+        with file_lock(path):
+            acquired.set()
+            release.wait()
+            order.append("first")
+
+    t = threading.Thread(target=hold)
+    t.start()
+    acquired.wait()
+    threading.Timer(0.2, release.set).start()
+    with file_lock(path, timeout=5):
+        order.append("second")
+    t.join()
+    assert order == ["first", "second"]
+
+
+def test_root_locks_are_independent(tmp_path):
+    with root_lock(tmp_path, "a"):
+        with root_lock(tmp_path, "b", timeout=0.1):
+            pass
+    assert (tmp_path / ".outpack" / "locks" / "a").exists()
@@ -1,8 +1,10 @@
 import sys
 
 import pytest
+from dataclasses_json import DataClassJsonMixin
 
 from pyorderly.outpack.metadata import (
+    PacketDepends,
     PacketDependsPath,
     PacketFile,
     read_metadata_core,
@@ -88,3 +90,50 @@ def test_can_error_if_file_not_found_in_metadata():
     d = read_metadata_core("example/.outpack/metadata/20230807-152344-ee606dce")
     with pytest.raises(Exception, match=r"Packet .+ does not contain file 'f'"):
         d.file_hash("f")
+
+
+def test_can_look_up_files_by_path():
+    d = read_metadata_core("example/.outpack/metadata/20230807-152344-ee606dce")
+    assert d.file("data.csv") is d.files[0]
+    assert d.path_index == {f.path: f for f in d.files}
+    assert d.path_index is d.path_index
+    assert "path_index" not in d.to_dict()
+
+
+def test_can_create_packet_file_metadata_from_many_files(tmp_path):
+    paths = [f"f{i}.txt" for i in range(10)]
+    for i, p in enumerate(paths):
+        tmp_path.joinpath(p).write_text("x" * i)
+    expected = [PacketFile.from_file(tmp_path, p, "md5") for p in paths]
+    assert PacketFile.from_files(tmp_path, paths, "md5") == expected
+    assert PacketFile.from_files(tmp_path, paths, "md5", workers=2) == expected
+
+
+def test_packet_files_are_compact():
+    f = PacketFile("data.csv", 1, "md5:abc")
+    assert not hasattr(f, "__dict__")
+
+
+def test_packet_files_can_be_serialised():
+    f = PacketFile("data.csv", 1, "md5:abc")
+    assert isinstance(f, DataClassJsonMixin)
+    assert PacketFile.from_json(f.to_json()) == f
+    d = PacketDepends("id", "latest", [PacketDependsPath("a.csv", "b.csv")])
+    assert d.to_dict() == {
+        "packet": "id",
+        "query": "latest",
+        "files": [{"here": "a.csv", "there": "b.csv"}],
+    }
+    assert PacketDepends.from_dict(d.to_dict()) == d
+
+
+def test_metadata_strings_are_shared_between_packets():
+    d1 = read_metadata_core(
+        "example/.outpack/metadata/20230807-152344-ee606dce"
+    )
+    d2 = read_metadata_core(
+        "example/.outpack/metadata/20230807-152344-ee606dce"
+    )
+    assert d1.files[0].path is d2.files[0].path
+    assert d1.files[0].hash is d2.files[0].hash
+    assert d1.name is d2.name
@@ -3,10 +3,12 @@ import os
 import pytest
 from jsonschema.exceptions import ValidationError
 
+from pyorderly.outpack import filestore
 from pyorderly.outpack.init import outpack_init
 from pyorderly.outpack.metadata import PacketDependsPath
-from pyorderly.outpack.packet import Packet
+from pyorderly.outpack.packet import Packet, insert_packet
 from pyorderly.outpack.root import root_open
+from pyorderly.outpack.tools import GitInfo
 
 from ..helpers import create_packet, create_random_packet, create_temporary_root
 
@@ -299,3 +301,92 @@ def test_cannot_create_packet_with_invalid_filename(tmp_path):
     with pytest.raises(ValidationError):
         with create_packet(root, "data") as p:
             (p.path / "bad\x01file\x01name").touch()
+
+
+def test_inserting_packet_does_not_rehash_files(tmp_path, mocker):
+    root = create_temporary_root(
+        tmp_path, use_file_store=True, path_archive="archive"
+    )
+    spy = mocker.spy(filestore, "hash_validate_file")
+
+    with create_packet(root, "data") as p:
+        p.path.joinpath("a").write_text("hello")
+        p.path.joinpath("b").write_text("goodbye")
+
+    spy.assert_not_called()
+    assert sorted(str(h) for h in root.files.ls()) == sorted(
+        f.hash for f in p.files
+    )
+    assert (tmp_path / "archive" / "data" / p.id / "a").exists()
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        {"use_file_store": False, "path_archive": "archive"},
+        {"use_file_store": True, "path_archive": None},
+        {"use_file_store": True, "path_archive": "archive"},
+    ],
+)
+def test_can_insert_packet_by_moving_files(tmp_path, config):
+    root = create_temporary_root(tmp_path / "root", **config)
+    src = tmp_path / "src"
+    src.mkdir()
+    src.joinpath("a").write_text("hello")
+    src.joinpath("b").write_text("hello")
+    src.joinpath("sub").mkdir()
+    src.joinpath("sub", "c").write_text("goodbye")
+
+    p = Packet(root, src, "data")
+    meta = p.end()
+    insert_packet(root, src, meta, move=True)
+
+    assert not src.joinpath("sub", "c").exists()
+    assert root.index.unpacked() == [p.id]
+
+    if config["path_archive"]:
+        dest = root.path / "archive" / "data" / p.id
+        assert dest.joinpath("a").read_text() == "hello"
+        assert dest.joinpath("b").read_text() == "hello"
+        assert dest.joinpath("sub", "c").read_text() == "goodbye"
+
+    if config["use_file_store"]:
+        assert sorted(str(h) for h in root.files.ls()) == sorted(
+            {f.hash for f in meta.files}
+        )
+
+
+def test_failed_insertion_keeps_moved_files(tmp_path, mocker):
+    root = create_temporary_root(
+        tmp_path / "root", use_file_store=True, path_archive=None
+    )
+    src = tmp_path / "src"
+    src.mkdir()
+    src.joinpath("a").write_text("hello")
+    p = Packet(root, src, "data")
+    meta = p.end()
+
+    mocker.patch(
+        "pyorderly.outpack.packet.write_atomic", side_effect=OSError("full")
+    )
+    with pytest.raises(OSError, match="full"):
+        insert_packet(root, src, meta, move=True)
+
+    assert root.index.unpacked() == []
+    assert not src.joinpath("a").exists()
+    dest = tmp_path / "dest"
+    root.files.get(meta.files[0].hash, dest)
+    assert dest.read_text() == "hello"
+
+
+def test_can_provide_git_metadata_to_packet(tmp_path):
+    root = create_temporary_root(tmp_path / "root")
+    src = tmp_path / "src"
+    src.mkdir()
+    git = GitInfo("abc123", "main", ["https://example.com/git"])
+
+    p = Packet(root, src, "data", git=git)
+    assert p.end().git == git
+
+    p = Packet(root, src, "data", git=None)
+    assert p.end().git is None
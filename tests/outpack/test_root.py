@@ -4,8 +4,10 @@ import pytest
 
 from pyorderly.outpack.config import read_config
 from pyorderly.outpack.filestore import FileStore
+from pyorderly.outpack.hash import hash_file
 from pyorderly.outpack.index import Index
 from pyorderly.outpack.init import outpack_init
+from pyorderly.outpack.metadata import PacketFile
 from pyorderly.outpack.root import find_file_by_hash, root_open
 from pyorderly.outpack.util import transient_working_directory
 
@@ -116,6 +118,42 @@ def test_can_export_files_from_root_using_archive(tmp_path):
     assert (dest / "result.txt").exists()
 
 
+@pytest.mark.parametrize("use_file_store", [True, False])
+def test_can_export_many_files_from_root(tmp_path, use_file_store):
+    outpack_init(
+        tmp_path / "root",
+        use_file_store=use_file_store,
+        path_archive=None if use_file_store else "archive",
+    )
+    ids = [helpers.create_random_packet(tmp_path / "root") for _ in range(2)]
+    r = root_open(tmp_path / "root")
+    f1 = r.index.metadata(ids[0]).files[0]
+    f2 = r.index.metadata(ids[1]).files[0]
+    f3 = PacketFile(path="other.txt", size=1, hash=f"sha256:{'0' * 64}")
+
+    dest = tmp_path / "dest"
+    res = r.export_files({"a.txt": f1, "b/c.txt": f2, "d.txt": f3}, dest)
+
+    assert res == {"d.txt": f3}
+    assert str(hash_file(dest / "a.txt")) == f1.hash
+    assert str(hash_file(dest / "b" / "c.txt")) == f2.hash
+    assert not (dest / "d.txt").exists()
+
+
+def test_export_many_files_skips_corrupted_files(tmp_path, capsys):
+    outpack_init(tmp_path, use_file_store=False, path_archive="archive")
+    id = helpers.create_random_packet(tmp_path)
+    root = root_open(tmp_path)
+    f = root.index.metadata(id).files[0]
+    with open(root.path / "archive" / "data" / id / "data.txt", "a") as con:
+        con.write("1")
+
+    dest = tmp_path / "dest"
+    assert root.export_files({"result.txt": f}, dest) == {"result.txt": f}
+    assert not (dest / "result.txt").exists()
+    assert "Rejecting file from archive" in capsys.readouterr().out
+
+
 def test_root_path_is_absolute(tmp_path):
     helpers.create_temporary_root(tmp_path / "foo")
     (tmp_path / "bar").mkdir()
@@ -4,9 +4,11 @@ import pytest
 from jsonschema.exceptions import ValidationError
 
 from pyorderly.outpack.schema import (
+    _validator,
     outpack_schema_version,
     read_schema,
     validate,
+    validate_many,
 )
 
 
@@ -32,3 +34,19 @@ def test_can_validate_referenced_schemas():
 
 def test_can_get_schema_version():
     assert outpack_schema_version() == "0.1.1"
+
+
+def test_can_validate_many_instances():
+    p = "example/.outpack/location/local/20230807-152344-ee606dce"
+    with open(p) as f:
+        loc = json.load(f)
+    validate_many([loc, loc], "outpack/location.json")
+    validate_many([], "outpack/location.json")
+    with pytest.raises(ValidationError):
+        validate_many([loc, {**loc, "packet": "yes"}], "outpack/location.json")
+
+
+def test_validators_are_reused():
+    assert _validator("outpack/location.json") is _validator(
+        "outpack/location.json"
+    )
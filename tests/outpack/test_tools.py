@@ -55,3 +55,36 @@ def test_git_report_several_urls(tmp_path):
 def test_git_report_from_subdir(tmp_path):
     simple_git_example(tmp_path)
     assert git_info(tmp_path) == git_info(tmp_path / "subdir")
+
+
+def test_git_info_is_cached_per_repository(tmp_path, mocker):
+    sha = simple_git_example(tmp_path)
+    spy = mocker.spy(pygit2, "Repository")
+
+    res1 = git_info(tmp_path)
+    res2 = git_info(tmp_path / "subdir")
+    assert res1 == res2
+    assert res1.sha == sha
+    assert spy.call_count <= 1
+
+    # Results are copies, so modifying one doesn't corrupt the cache.
+    res1.url.append("https://example.com/git")
+    assert git_info(tmp_path).url == []
+
+
+def test_git_info_cache_is_invalidated_by_new_commits(tmp_path):
+    sha1 = simple_git_example(tmp_path)
+    assert git_info(tmp_path).sha == sha1
+
+    repo = pygit2.Repository(tmp_path)
+    (tmp_path / "other").write_text("world")
+    repo.index.add_all()
+    author = pygit2.Signature("Alice Author", "alice@example.com")
+    tree = repo.index.write_tree()
+    sha2 = str(
+        repo.create_commit("HEAD", author, author, "Second", tree, [sha1])
+    )
+    assert git_info(tmp_path).sha == sha2
+
+    repo.remotes.create("origin", "https://example.com/git")
+    assert git_info(tmp_path).url == ["https://example.com/git"]
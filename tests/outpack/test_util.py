@@ -1,6 +1,7 @@
 import datetime
 import os
 import re
+import threading
 
 import pytest
 
@@ -9,17 +10,23 @@ from pyorderly.outpack.util import (
     as_posix_path,
     assert_file_exists,
     assert_relative_path,
+    clone_file,
     expand_dirs,
     find_file_descend,
     format_list,
+    fsync_batch,
+    fsync_later,
     iso_time_str,
     match_value,
     num_to_time,
     openable_temporary_file,
+    parallel_map,
     partition,
     pl,
     read_string,
+    replace_later,
     time_to_num,
+    write_atomic,
 )
 
 from .. import helpers
@@ -199,6 +206,33 @@ def test_can_partition():
     assert false_list == test_list
 
 
+@pytest.mark.parametrize("reflink", [True, False])
+def test_can_clone_file(tmp_path, mocker, reflink):
+    if not reflink:
+        mocker.patch("pyorderly.outpack.util.fcntl", None)
+
+    src = tmp_path / "src"
+    dst = tmp_path / "dst"
+    src.write_text("hello")
+    os.utime(src, (1000000000, 1000000000))
+
+    clone_file(src, dst)
+    assert dst.read_text() == "hello"
+    assert dst.stat().st_mtime == 1000000000
+
+    dst.write_text("goodbye")
+    assert src.read_text() == "hello"
+
+
+def test_parallel_map_preserves_order():
+    items = list(range(50))
+    expected = [x * x for x in items]
+    assert parallel_map(lambda x: x * x, items) == expected
+    assert parallel_map(lambda x: x * x, items, workers=1) == expected
+    assert parallel_map(lambda x: x * x, items, workers=4) == expected
+    assert parallel_map(lambda x: x * x, []) == []
+
+
 def test_openable_temporary_file():
     with openable_temporary_file(mode="w") as f1:
         f1.write("Hello")
@@ -231,3 +265,108 @@ def test_as_posix_path():
         "here/aaa": "there/bbb",
         "foo/bar": "baz/qux",
     }
+
+
+def test_write_atomic(tmp_path):
+    path = tmp_path / "sub" / "file"
+    write_atomic(path, "hello")
+    assert path.read_text() == "hello"
+
+    write_atomic(path, b"goodbye")
+    assert path.read_bytes() == b"goodbye"
+    assert os.listdir(path.parent) == ["file"]
+
+
+def test_write_atomic_leaves_nothing_on_failure(tmp_path):
+    path = tmp_path / "file"
+    path.write_text("hello")
+    with pytest.raises(TypeError):
+        write_atomic(path, 1)  # type: ignore
+    assert path.read_text() == "hello"
+    assert os.listdir(tmp_path) == ["file"]
+
+
+def test_fsync_batch_flushes_files_and_directories_once(tmp_path, mocker):
+    spy = mocker.spy(os, "fsync")
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+
+    # On its own, a file and its directory are flushed straight away.
+    write_atomic(tmp_path / "a" / "x", "x")
+    assert spy.call_count == 2
+    spy.reset_mock()
+
+    with fsync_batch():
+        write_atomic(tmp_path / "a" / "x", "x")
+        write_atomic(tmp_path / "a" / "y", "y")
+        with fsync_batch():
+            write_atomic(tmp_path / "b" / "z", "z")
+        (tmp_path / "b" / "w").write_text("w")
+        fsync_later(tmp_path / "b" / "w")
+        assert spy.call_count == 0
+        # Files only appear once they have been flushed.
+        assert not (tmp_path / "a" / "y").exists()
+    # Four files, and two directories
+    assert spy.call_count == 6
+    assert (tmp_path / "a" / "y").read_text() == "y"
+    assert sorted(os.listdir(tmp_path / "a")) == ["x", "y"]
+
+
+def test_fsync_batch_does_not_flush_on_error(tmp_path, mocker):
+    spy = mocker.spy(os, "fsync")
+    with pytest.raises(Exception, match="Some error"):
+        with fsync_batch():
+            write_atomic(tmp_path / "x", "x")
+            msg = "Some error"
+            raise Exception(msg)
+    assert spy.call_count == 0
+    assert os.listdir(tmp_path) == []
+
+
+def test_fsync_batch_completes_kept_renames_on_error(tmp_path):
+    src = tmp_path / "src"
+    src.write_text("x")
+    with pytest.raises(Exception, match="Some error"):
+        with fsync_batch():
+            replace_later(src, tmp_path / "dst", keep=True)
+            write_atomic(tmp_path / "x", "x")
+            msg = "Some error"
+            raise Exception(msg)
+    assert os.listdir(tmp_path) == ["dst"]
+    assert (tmp_path / "dst").read_text() == "x"
+
+
+def test_fsync_batch_is_carried_into_parallel_map(tmp_path, mocker):
+    spy = mocker.spy(os, "fsync")
+    paths = [tmp_path / f"f{i}" for i in range(10)]
+    with fsync_batch():
+        parallel_map(lambda p: write_atomic(p, "x"), paths, workers=4)
+        assert spy.call_count == 0
+        assert not any(p.exists() for p in paths)
+    assert all(p.exists() for p in paths)
+    assert spy.call_count == 11
+
+
+def test_fsync_batches_belong_to_their_thread(tmp_path):
+    started = threading.Event()
+    release = threading.Event()
+
+    def other():
+        with fsync_batch():
+            started.set()
+            release.wait()
+            write_atomic(tmp_path / "other", "x")
+        assert (tmp_path / "other").exists()
+
+    t = threading.Thread(target=other)
+    t.start()
+    started.wait()
+    with fsync_batch():
+        write_atomic(tmp_path / "mine", "x")
+        release.set()
+        t.join()
+        # The other thread's batch completed without waiting for ours,
+        # and ours still holds our file back.
+        assert (tmp_path / "other").exists()
+        assert not (tmp_path / "mine").exists()
+    assert (tmp_path / "mine").exists()
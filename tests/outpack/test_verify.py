@@ -0,0 +1,67 @@
+import pytest
+
+from pyorderly.outpack.verify import outpack_verify
+
+from .. import helpers
+
+
+@pytest.mark.parametrize(
+    ("use_file_store", "path_archive", "copies"),
+    [(True, None, 1), (False, "archive", 1), (True, "archive", 2)],
+)
+def test_can_verify_root(
+    tmp_path, capsys, use_file_store, path_archive, copies
+):
+    root = helpers.create_temporary_root(
+        tmp_path, use_file_store=use_file_store, path_archive=path_archive
+    )
+    for _ in range(3):
+        helpers.create_random_packet(root)
+
+    res = outpack_verify(root)
+
+    assert res.ok
+    assert res.files == 3 * copies
+    assert capsys.readouterr().out.startswith(f"Verified {3 * copies} files")
+
+
+def test_verify_finds_problems_in_archive(tmp_path):
+    root = helpers.create_temporary_root(
+        tmp_path, use_file_store=False, path_archive="archive"
+    )
+    ids = [helpers.create_random_packet(root) for _ in range(3)]
+    path = root.path / "archive" / "data"
+    (path / ids[0] / "data.txt").write_text("corrupted")
+    (path / ids[1] / "data.txt").unlink()
+
+    res = outpack_verify(root, workers=1)
+
+    assert not res.ok
+    assert res.files == 2
+    assert res.corrupt == [f"archive/data/{ids[0]}/data.txt"]
+    assert res.missing == [f"archive/data/{ids[1]}/data.txt"]
+
+
+def test_verify_finds_problems_in_store(tmp_path):
+    root = helpers.create_temporary_root(tmp_path, use_file_store=True)
+    ids = [helpers.create_random_packet(root) for _ in range(2)]
+    h0 = root.index.metadata(ids[0]).files[0].hash
+    h1 = root.index.metadata(ids[1]).files[0].hash
+    path = root.files.find(h0)
+    path.chmod(0o644)
+    path.write_text("corrupted")
+    root.files.remove(h1)
+
+    res = outpack_verify(root)
+
+    assert res.corrupt == [h0]
+    assert res.missing == [h1]
+
+
+def test_verify_reports_progress(tmp_path, capsys):
+    root = helpers.create_temporary_root(tmp_path, use_file_store=True)
+    helpers.create_random_packet(root)
+    outpack_verify(root, progress_interval=0)
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].startswith("Checked 1/2 files (")
+    assert out[1].startswith("Checked 2/2 files (")